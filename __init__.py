@@ -8,6 +8,9 @@
 """
 from calibre.customize import InterfaceActionBase
 
+# Startup budget: only the action registration below is imported when Calibre
+# boots. Config, worker, API and dialogs are imported on first use.
+
 class SmartSummaryProPlugin(InterfaceActionBase):
     name                = 'SmartSummary Pro'
     description         = 'Generate deep literary summaries using AI models.'
@@ -23,7 +26,7 @@ class SmartSummaryProPlugin(InterfaceActionBase):
         return True
 
     def config_widget(self):
-        from .core.config import ConfigWidget
+        from .interfaces.settings import ConfigWidget
         return ConfigWidget()
 
     def save_settings(self, config_widget):
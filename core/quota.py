@@ -1,5 +1,5 @@
 """
-@Input:  API Model ID, Cost
+@Input:  API Model ID, Key Fingerprint, Cost, Optional RunConfig Snapshot
 @Output: Quota Validation Boolean
 @Pos:    core / quota.py. Kernel Limiter.
 
@@ -7,10 +7,26 @@
 !!! update this header AND the parent directory's _DIR_META.md.
 """
 import datetime
-from calibre_plugins.smart_summary_pro.core.config import prefs
+import hashlib
+import threading
+from calibre_plugins.smart_summary_pro.core.config import prefs, get_model_keys, is_local_model
+
+# Shared by every QuotaManager (one per job): check-and-count must be atomic
+# across all engine threads, or concurrent requests overshoot the limit.
+_usage_lock = threading.RLock()
+
+def key_fingerprint(api_key):
+    """Stable, non-reversible id for a key (usage stats never store the key)."""
+    return hashlib.sha1(api_key.encode('utf-8')).hexdigest()[:12]
 
 class QuotaManager:
-    def __init__(self):
+    """
+    Daily usage against each model's limit. With a RunConfig, limits and
+    keys come from the job's snapshot (indexed by id); without one, from
+    the live settings.
+    """
+    def __init__(self, config=None):
+        self.config = config
         self.load_state()
 
     def load_state(self):
@@ -20,6 +36,7 @@ class QuotaManager:
         self.check_reset()
 
     def check_reset(self):
+        """Rolls usage over on a new day; returns True if a reset happened."""
         today = datetime.date.today().isoformat()
         if self.last_reset != today:
             # It's a new day, reset everything
@@ -34,10 +51,41 @@ class QuotaManager:
             # prefs['usage_stats'] has usage.
             
             prefs['usage_stats'] = {} 
+            prefs['key_usage_stats'] = {}
             prefs['last_reset_date'] = today
             self.last_reset = today
-            # Trigger save
-            pass
+            return True
+        return False
+
+    def _models(self):
+        if self.config is not None:
+            return self.config.models
+        return prefs.get('api_configs', [])
+
+    def _find_model(self, model_id):
+        if self.config is not None:
+            return self.config.model(model_id)
+        for conf in prefs.get('api_configs', []):
+            if conf.get('id') == model_id:
+                return conf
+        return None
+
+    def _model_limit(self, model_id):
+        """
+        Daily limit of the whole model: the per-key limit times the pool size.
+        0 means unlimited (always the case for local servers).
+        """
+        conf = self._find_model(model_id)
+        if conf is None or is_local_model(conf):
+            return 0
+        limit = conf.get('daily_limit', 0)
+        if limit <= 0:
+            return 0
+        return limit * max(1, len(get_model_keys(conf)))
+
+    def daily_limit(self, model_id):
+        """The model's whole daily limit (all keys of its pool); 0 = unlimited."""
+        return self._model_limit(model_id)
 
     def check_quota(self, model_id, cost=1):
         """
@@ -45,18 +93,9 @@ class QuotaManager:
         """
         self.check_reset()
         
-        # Get limit from config
-        api_configs = prefs.get('api_configs', [])
-        limit = 0
-        for conf in api_configs:
-            if conf.get('id') == model_id:
-                limit = conf.get('daily_limit', 0)
-                break
-        
+        limit = self._model_limit(model_id)
         if limit <= 0:
-            return True # 0 means unlimited (or handle as disabled? Let's assume 0 is unlimited for now or handle in UI)
-            # Actually, typically 0 might mean no limit, but user said "Quota Exceeded" if limit reached.
-            # Let's assume 0 meant unlimited.
+            return True # 0 means unlimited
         
         usage_stats = prefs.get('usage_stats', {})
         current_usage = usage_stats.get(model_id, 0)
@@ -66,9 +105,69 @@ class QuotaManager:
             
         return True
 
-    def increment_usage(self, model_id, cost=1):
+    def remaining(self, model_id):
+        """
+        Returns the number of requests left today, or None if unlimited.
+        """
         self.check_reset()
-        usage_stats = prefs.get('usage_stats', {})
-        current_usage = usage_stats.get(model_id, 0)
-        usage_stats[model_id] = current_usage + cost
-        prefs['usage_stats'] = usage_stats
+        limit = self._model_limit(model_id)
+        if limit <= 0:
+            return None
+        usage = prefs.get('usage_stats', {}).get(model_id, 0)
+        return max(0, limit - usage)
+
+    def total_remaining(self):
+        """
+        Requests left today across all models, or None if any model is unlimited.
+        """
+        total = 0
+        for conf in self._models():
+            left = self.remaining(conf.get('id'))
+            if left is None:
+                return None
+            total += left
+        return total
+
+    def key_usage(self, model_id, fingerprint):
+        self.check_reset()
+        return prefs.get('key_usage_stats', {}).get(model_id, {}).get(fingerprint, 0)
+
+    def check_key_quota(self, model_id, fingerprint, cost=1):
+        """
+        Returns True if this key of the model's pool has quota left.
+        """
+        conf = self._find_model(model_id)
+        limit = conf.get('daily_limit', 0) if conf else 0
+        if limit <= 0 or is_local_model(conf):
+            return True
+        return self.key_usage(model_id, fingerprint) + cost <= limit
+
+    def reserve(self, model_id, fingerprint=None, cost=1):
+        """
+        Checks the model's (and the key's) quota and counts the request in
+        one step, before it is sent. Returns False if there is no room.
+        A request that then fails must be given back with refund().
+        """
+        with _usage_lock:
+            if not self.check_quota(model_id, cost):
+                return False
+            if fingerprint and not self.check_key_quota(model_id, fingerprint, cost):
+                return False
+            self.increment_usage(model_id, cost, fingerprint)
+            return True
+
+    def refund(self, model_id, fingerprint=None, cost=1):
+        self.increment_usage(model_id, -cost, fingerprint)
+
+    def increment_usage(self, model_id, cost=1, fingerprint=None):
+        with _usage_lock:
+            self.check_reset()
+            usage_stats = prefs.get('usage_stats', {})
+            current_usage = usage_stats.get(model_id, 0)
+            usage_stats[model_id] = max(0, current_usage + cost)
+            prefs['usage_stats'] = usage_stats
+            if fingerprint:
+                key_stats = prefs.get('key_usage_stats', {})
+                per_model = key_stats.setdefault(model_id, {})
+                per_model[fingerprint] = max(0, per_model.get(fingerprint, 0) + cost)
+                prefs['key_usage_stats'] = key_stats
@@ -1,5 +1,5 @@
 """
-@Input:  System Prompt, User Prompt, Configured Models
+@Input:  System Prompt, User Prompt, RunConfig Snapshot, Router Stats, Key Pools, Local Slot Counts
 @Output: Generated Summary (String)
 @Pos:    infrastructure / api_manager.py. Adapter for external LLMs.
 
@@ -11,22 +11,154 @@ import urllib.request
 import urllib.error
 import time
 import random
+import threading
 from calibre_plugins.smart_summary_pro.core.quota import QuotaManager
-from calibre_plugins.smart_summary_pro.core.config import prefs
+from calibre_plugins.smart_summary_pro.core.config import RunConfig, get_model_keys, is_local_model
+from calibre_plugins.smart_summary_pro.infrastructure.local_backend import probe_slots
+from calibre_plugins.smart_summary_pro.infrastructure.router import get_router
+from calibre_plugins.smart_summary_pro.infrastructure.key_pool import KeyPool, get_key_pool
 
-class APIManager:
+class APIError(Exception):
+    """HTTP error returned by a provider; keeps the status code for key eviction."""
+    def __init__(self, code, body):
+        super().__init__(f"API Error {code}: {body}")
+        self.code = code
+
+class DeadlineExceeded(Exception):
+    """The book's or job's time budget ran out before a model could answer."""
+    pass
+
+class Deadline:
+    """
+    Absolute time budget, optionally capped by a parent (book within job).
+    A Deadline(None) never expires.
+    """
+    def __init__(self, seconds=None, parent=None):
+        self.at = time.monotonic() + seconds if seconds else None
+        if parent is not None and parent.at is not None:
+            self.at = parent.at if self.at is None else min(self.at, parent.at)
+
+    def remaining(self):
+        """Seconds left, or None if unbounded."""
+        if self.at is None:
+            return None
+        return self.at - time.monotonic()
+
+    def expired(self):
+        left = self.remaining()
+        return left is not None and left <= 0
+
+    def allows(self, seconds):
+        """True if something expected to take `seconds` can still finish in time."""
+        left = self.remaining()
+        return left is None or left > seconds
+
+class QuotaExhaustedError(Exception):
+    """Every model was skipped for quota alone; the request can be retried later."""
+    pass
+
+class ModelSlots:
+    """
+    Per-model concurrency limits ('max_concurrency', default 3). Local
+    servers are sized to the slot count they report instead. Plain counters
+    under one condition: a limit that changes between jobs applies to new
+    requests, while those already running are still counted against it.
+    """
     def __init__(self):
-        self.quota_mgr = QuotaManager()
+        self._cond = threading.Condition()
+        self._busy = {}
+        self._limits = {}
+        self._local = set()
+
+    def limit_for(self, model_conf):
+        model_id = model_conf.get('id')
+        limit = max(1, int(model_conf.get('max_concurrency', 3) or 3))
+        if is_local_model(model_conf):
+            limit = probe_slots(model_conf.get('endpoint', '')) or limit
+        with self._cond:
+            if self._limits.get(model_id) != limit:
+                self._limits[model_id] = limit
+                self._cond.notify_all()  # A raised limit frees waiters
+            if is_local_model(model_conf):
+                self._local.add(model_id)
+        return limit
+
+    def local_capacity(self):
+        """Sum of the slot counts learned so far for local models."""
+        with self._cond:
+            return sum(self._limits[mid] for mid in self._local)
+
+    def acquire(self, model_conf, timeout=None):
+        """Returns False if no slot freed up within timeout."""
+        model_id = model_conf.get('id')
+        self.limit_for(model_conf)
+        end = None if timeout is None else time.monotonic() + max(0, timeout)
+        with self._cond:
+            while self._busy.get(model_id, 0) >= self._limits[model_id]:
+                wait = None if end is None else end - time.monotonic()
+                if wait is not None and wait <= 0:
+                    return False
+                self._cond.wait(wait)
+            self._busy[model_id] = self._busy.get(model_id, 0) + 1
+        return True
+
+    def release(self, model_id):
+        with self._cond:
+            count = self._busy.get(model_id, 0) - 1
+            if count > 0:
+                self._busy[model_id] = count
+            else:
+                self._busy.pop(model_id, None)
+            self._cond.notify_all()
+
+    def free_first(self, models):
+        """Stable reorder: models with a free slot before saturated ones."""
+        with self._cond:
+            busy = dict(self._busy)
+            limits = dict(self._limits)
+        def saturated(m):
+            limit = limits.get(m.get('id')) or max(1, int(m.get('max_concurrency', 3) or 3))
+            return busy.get(m.get('id'), 0) >= limit
+        return [m for m in models if not saturated(m)] + [m for m in models if saturated(m)]
+
+class APIManager:
+    """
+    Runs requests for one job against its RunConfig snapshot (taken now if
+    none is given). Router stats and key pools are process-wide; model
+    slots are shared when the engine passes its own.
+    """
+    def __init__(self, config=None, slots=None):
+        self.config = config or RunConfig()
+        self.quota_mgr = QuotaManager(self.config)
+        self.router = get_router()
+        self.key_pool = get_key_pool()
+        self.slots = slots or ModelSlots()
 
     def get_ordered_models(self):
-        return prefs.get('api_configs', [])
+        models = list(self.config.models)
+        if self.config.routing_policy == 'priority':
+            return models
+        # Balanced: spread load by observed latency, errors and quota headroom.
+        return self.router.order(models, self.quota_mgr)
 
-    def generate_summary(self, prompt):
-        models = self.get_ordered_models()
-        if not models:
+    def generate_summary(self, prompt, deadline=None):
+        return self.generate(prompt, deadline)[0]
+
+    def generate(self, prompt, deadline=None):
+        """
+        Returns (content, model_conf, usage) of the model that answered.
+        With a deadline, models that cannot be expected to answer in the
+        remaining time are not tried, and DeadlineExceeded is raised.
+        """
+        deadline = deadline or Deadline()
+        if not self.config.models:
             raise Exception("No API models configured. Please check Settings.")
+        models = self.slots.free_first(self.get_ordered_models())
+        if not models:
+            raise QuotaExhaustedError("All configured models failed.\nAll models have exceeded their daily quota.")
 
         errors = []
+        out_of_time = False
         for model in models:
             model_id = model.get('id')
             name = model.get('name')
@@ -34,32 +166,53 @@ class APIManager:
             if not self.quota_mgr.check_quota(model_id):
                 print(f"Skipping {name}: Quota exceeded.")
                 continue
+            
+            if not deadline.allows(self.router.expected_latency(model_id)):
+                print(f"Skipping {name}: cannot finish before the deadline.")
+                out_of_time = True
+                continue
 
+            # Global per-model concurrency limit, shared by every job.
+            if not self.slots.acquire(model, timeout=deadline.remaining()):
+                out_of_time = True
+                continue
             try:
                 print(f"Attempting generation with {name}...")
-                result = self.call_model_api(model, prompt)
-                self.quota_mgr.increment_usage(model_id)
-                return result
+                started = time.monotonic()
+                result, usage = self.call_model_api(model, prompt, deadline)
+                self.router.record_success(model_id, time.monotonic() - started)
+                return result, model, usage
                 
+            except QuotaExhaustedError:
+                # Another worker took the last of this model's quota meanwhile.
+                print(f"Skipping {name}: Quota exceeded.")
+            except DeadlineExceeded as e:
+                out_of_time = True
+                errors.append(f"{name} failed: {str(e)}")
             except Exception as e:
+                self.router.record_failure(model_id)
                 error_msg = f"{name} failed: {str(e)}"
                 print(error_msg)
                 errors.append(error_msg)
+            finally:
+                self.slots.release(model_id)
         
+        if out_of_time:
+            raise DeadlineExceeded("Deadline exceeded.\n" + "\n".join(errors))
+        if not errors:
+            raise QuotaExhaustedError("All configured models failed.\nAll models have exceeded their daily quota.")
         raise Exception("All configured models failed.\n" + "\n".join(errors))
 
-    def call_model_api(self, model_conf, prompt):
-        raw_key = model_conf.get('api_key', '')
-        
-        from calibre_plugins.smart_summary_pro.core.config import deobfuscate_key
-        if raw_key.startswith("ENC:"):
-            api_key = deobfuscate_key(raw_key[4:])
-        else:
-            api_key = raw_key
-
+    def call_model_api(self, model_conf, prompt, deadline=None):
+        deadline = deadline or Deadline()
+        model_id = model_conf.get('id')
         endpoint = model_conf.get('endpoint')
         model_name = model_conf.get('model_name')
-        max_tokens = prefs.get('max_tokens', 4096)
+        max_tokens = self.config.max_tokens
+        
+        if hasattr(prompt, 'for_model'):
+            # Compiled prompt: render within this model's context budget.
+            prompt = prompt.for_model(model_conf)
         
         if isinstance(prompt, (list, tuple)) and len(prompt) == 2:
             system_prompt, user_prompt = prompt
@@ -78,40 +231,102 @@ class APIManager:
         }
         
         data = json.dumps(payload).encode('utf-8')
-        request = urllib.request.Request(
-            endpoint,
-            data=data,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}"
-            },
-            method='POST'
-        )
+        pool_size = len(get_model_keys(model_conf))
+        local = is_local_model(model_conf)
+        
+        expected = self.router.expected_latency(model_id)
         
         max_retries = 2
         for attempt in range(max_retries + 1):
+            # Timeout follows this model's latency history, capped by the deadline.
+            timeout = self.router.timeout_for(model_id, local)
+            remaining = deadline.remaining()
+            if remaining is not None:
+                if remaining <= 0:
+                    raise DeadlineExceeded("No time left for another attempt.")
+                timeout = min(timeout, remaining)
+            # Quota is reserved before sending, so parallel workers cannot
+            # overshoot a daily limit; it is refunded if the request fails.
+            if local and not pool_size:
+                # Keyless local server: no pool, no Authorization header.
+                api_key, fingerprint = "", None
+                if not self.quota_mgr.reserve(model_id):
+                    api_key = None
+            else:
+                api_key, fingerprint = self.key_pool.acquire(model_conf, self.quota_mgr)
+            if api_key is None:
+                if local or self.key_pool.has_available(model_conf):
+                    raise QuotaExhaustedError(f"{model_conf.get('name')} reached its daily limit.")
+                raise Exception("No usable API key (all keys evicted or over quota).")
+            succeeded = False
             try:
-                with urllib.request.urlopen(request, timeout=60) as response:
-                    response_data = response.read().decode('utf-8')
-                    result = json.loads(response_data)
-                    try:
-                        content = result['choices'][0]['message']['content']
-                        return content
-                    except (KeyError, IndexError):
-                        raise Exception("Unexpected API response format.")
+                content, usage = self._post(endpoint, data, api_key, timeout)
+                succeeded = True
+                return content, usage
                         
-            except urllib.error.HTTPError as e:
+            except APIError as e:
+                if e.code in (401, 403):
+                    # Bad key: take it out of rotation and let another key try.
+                    self.key_pool.evict(model_id, fingerprint, KeyPool.AUTH_EVICT_SECONDS)
+                    if attempt < max_retries and self.key_pool.has_available(model_conf):
+                        continue
+                    raise
+                if e.code == 429 and pool_size > 1:
+                    # Rate limited key: cool it down, the next key takes over at once.
+                    self.key_pool.evict(model_id, fingerprint, KeyPool.RATE_EVICT_SECONDS)
+                    if attempt < max_retries and self.key_pool.has_available(model_conf):
+                        continue
                 if e.code in (429, 502, 503, 504) and attempt < max_retries:
-                    sleep_time = (2 ** attempt) + random.uniform(0, 1)
+                    if local:
+                        # Busy local server: a slot frees up in well under a second.
+                        sleep_time = 0.2 + random.uniform(0, 0.2)
+                    else:
+                        sleep_time = (2 ** attempt) + random.uniform(0, 1)
+                    if not deadline.allows(sleep_time + expected):
+                        raise DeadlineExceeded(f"API Error {e.code}; no time left to retry.")
                     print(f"API Rate limited/Overloaded ({e.code}). Retrying in {sleep_time:.2f}s...")
                     time.sleep(sleep_time)
                     continue
-                error_body = e.read().decode('utf-8') if e.fp else str(e)
-                raise Exception(f"API Error {e.code}: {error_body}")
-            except urllib.error.URLError as e:
-                if attempt < max_retries:
-                    time.sleep(2)
+                raise
+            except (urllib.error.URLError, TimeoutError) as e:
+                reason = getattr(e, 'reason', e)
+                if deadline.expired():
+                    raise DeadlineExceeded(f"Timed out at the deadline: {reason}")
+                if local and isinstance(reason, TimeoutError):
+                    # The server is still busy with this very request; sending it
+                    # again only queues a duplicate behind it.
+                    raise Exception(f"Local server timed out after {timeout:.0f}s")
+                pause = 0.2 if local else 2
+                if attempt < max_retries and deadline.allows(pause + expected):
+                    time.sleep(pause)
                     continue
-                raise Exception(f"Network Error: {str(e.reason)}")
+                raise Exception(f"Network Error: {str(reason)}")
             except json.JSONDecodeError as e:
                 raise Exception(f"Invalid JSON response: {str(e)}")
+            finally:
+                if not succeeded:
+                    self.quota_mgr.refund(model_id, fingerprint)
+                if fingerprint is not None:
+                    self.key_pool.release(model_id, fingerprint)
+
+    def _post(self, endpoint, data, api_key, timeout=60):
+        request = urllib.request.Request(
+            endpoint,
+            data=data,
+            headers={"Content-Type": "application/json"},
+            method='POST'
+        )
+        if api_key:
+            request.add_header("Authorization", f"Bearer {api_key}")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response_data = response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            error_body = e.read().decode('utf-8') if e.fp else str(e)
+            raise APIError(e.code, error_body)
+        result = json.loads(response_data)
+        try:
+            # 'usage' is optional in OpenAI-compatible responses
+            return result['choices'][0]['message']['content'], result.get('usage') or {}
+        except (KeyError, IndexError):
+            raise Exception("Unexpected API response format.")
@@ -0,0 +1,261 @@
+"""
+@Input:  Ebook Format File Path (EPUB / AZW3 / MOBI / TXT), Byte Budget
+@Output: Bounded Plain-text Excerpt (+ TOC) for the {excerpt} prompt variable
+@Pos:    infrastructure / excerpt.py. File Adapter.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import collections
+import concurrent.futures
+import html
+import os
+import posixpath
+import re
+import struct
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Preferred order when a book has several formats.
+EXCERPT_FORMATS = ('EPUB', 'AZW3', 'MOBI', 'TXT')
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_DROP_RE = re.compile(r'<(script|style|head)\b.*?</\1\s*>', re.S | re.I)
+_WS_RE = re.compile(r'\s+')
+_TOC_ENTRIES = 40
+
+
+def _html_to_text(markup):
+    markup = _DROP_RE.sub(' ', markup)
+    return _WS_RE.sub(' ', html.unescape(_TAG_RE.sub(' ', markup))).strip()
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+# ---------------------------------------------------------------- EPUB
+
+def _epub_excerpt(path, max_bytes):
+    with zipfile.ZipFile(path) as zf:
+        container = ET.fromstring(zf.read('META-INF/container.xml'))
+        opf_path = next(el.get('full-path') for el in container.iter() if _local(el.tag) == 'rootfile')
+        base = posixpath.dirname(opf_path)
+        opf = ET.fromstring(zf.read(opf_path))
+
+        manifest, toc_href = {}, None
+        spine = []
+        for el in opf.iter():
+            tag = _local(el.tag)
+            if tag == 'item':
+                href = posixpath.normpath(posixpath.join(base, el.get('href', '')))
+                manifest[el.get('id')] = href
+                if 'nav' in (el.get('properties') or '').split() or el.get('media-type') == 'application/x-dtbncx+xml':
+                    toc_href = toc_href or href
+            elif tag == 'itemref':
+                spine.append(el.get('idref'))
+
+        toc = []
+        if toc_href:
+            try:
+                toc_tree = ET.fromstring(zf.read(toc_href))
+                for el in toc_tree.iter():
+                    if _local(el.tag) in ('text', 'a') and el.text and el.text.strip():
+                        toc.append(el.text.strip())
+                        if len(toc) >= _TOC_ENTRIES:
+                            break
+            except (KeyError, ET.ParseError):
+                pass
+
+        parts, size = [], 0
+        for idref in spine:
+            href = manifest.get(idref)
+            if not href or href == toc_href:
+                continue
+            try:
+                # Streamed read: never inflate more than the remaining budget (x4 for markup).
+                with zf.open(href) as f:
+                    raw = f.read(max(4096, (max_bytes - size) * 4))
+            except KeyError:
+                continue
+            text = _html_to_text(raw.decode('utf-8', 'replace'))
+            if text:
+                parts.append(text)
+                size += len(text.encode('utf-8'))
+            if size >= max_bytes:
+                break
+    return toc, ' '.join(parts)
+
+
+# ------------------------------------------------------------ AZW3/MOBI
+
+def _palmdoc_decompress(data):
+    out = bytearray()
+    i, n = 0, len(data)
+    while i < n:
+        c = data[i]
+        i += 1
+        if c == 0 or 0x09 <= c <= 0x7f:
+            out.append(c)
+        elif c <= 0x08:
+            out += data[i:i + c]
+            i += c
+        elif c >= 0xc0:
+            out.append(0x20)
+            out.append(c ^ 0x80)
+        elif i < n:
+            c = (c << 8) | data[i]
+            i += 1
+            dist = (c >> 3) & 0x07ff
+            if not dist or dist > len(out):
+                continue
+            for _ in range((c & 7) + 3):
+                out.append(out[-dist])
+    return bytes(out)
+
+
+def _trailing_size(data, flags):
+    """Size of the trailing entries appended to a MOBI text record."""
+    size = 0
+    bits = flags >> 1
+    while bits:
+        if bits & 1:
+            value, shift, pos = 0, 0, len(data) - size
+            while pos > 0:
+                v = data[pos - 1]
+                value |= (v & 0x7f) << shift
+                shift += 7
+                pos -= 1
+                if v & 0x80 or shift >= 28:
+                    break
+            size += value
+        bits >>= 1
+    if flags & 1 and len(data) > size:
+        size += (data[len(data) - size - 1] & 0x3) + 1
+    return size
+
+
+def _mobi_excerpt(path, max_bytes):
+    with open(path, 'rb') as f:
+        header = f.read(78)
+        if len(header) < 78:
+            return [], ''
+        count = struct.unpack('>H', header[76:78])[0]
+        offsets = [struct.unpack('>I', f.read(8)[:4])[0] for _ in range(count)]
+        if not offsets:
+            return [], ''
+        f.seek(offsets[0])
+        rec0 = f.read((offsets[1] if count > 1 else offsets[0] + 1024) - offsets[0])
+        compression, _, _, text_records, _, encryption = struct.unpack('>HHIHHH', rec0[:14])
+        if encryption or compression not in (1, 2):
+            # DRM or HUFF/CDIC compression: not worth a full decoder here.
+            return [], ''
+        codec, extra_flags = 'cp1252', 0
+        if rec0[16:20] == b'MOBI':
+            mobi_len, = struct.unpack('>I', rec0[20:24])
+            if struct.unpack('>I', rec0[28:32])[0] == 65001:
+                codec = 'utf-8'
+            if mobi_len >= 0xE4 and len(rec0) >= 16 + 0xF4:
+                extra_flags, = struct.unpack('>H', rec0[16 + 0xF2:16 + 0xF4])
+
+        raw, i = bytearray(), 1
+        # Markup roughly quadruples the size of the text we want to keep.
+        while i <= text_records and i < count and len(raw) < max_bytes * 4:
+            end = offsets[i + 1] if i + 1 < count else None
+            f.seek(offsets[i])
+            data = f.read(end - offsets[i]) if end else f.read()
+            data = data[:len(data) - _trailing_size(data, extra_flags)] if extra_flags else data
+            raw += _palmdoc_decompress(data) if compression == 2 else data
+            i += 1
+    return [], _html_to_text(bytes(raw).decode(codec, 'replace'))
+
+
+# ----------------------------------------------------------------- TXT
+
+def _txt_excerpt(path, max_bytes):
+    with open(path, 'rb') as f:
+        data = f.read(max_bytes)
+    return [], _WS_RE.sub(' ', data.decode('utf-8', 'replace')).strip()
+
+
+_READERS = {
+    'EPUB': _epub_excerpt,
+    'AZW3': _mobi_excerpt,
+    'MOBI': _mobi_excerpt,
+    'TXT': _txt_excerpt,
+}
+
+
+def _truncate(text, max_bytes):
+    data = text.encode('utf-8')
+    if len(data) <= max_bytes:
+        return text
+    return data[:max_bytes].decode('utf-8', 'ignore').rsplit(' ', 1)[0] + ' ...'
+
+
+def read_excerpt(path, max_bytes):
+    """
+    Extracts a bounded excerpt without converting the book.
+    Returns '' for unsupported or unreadable files.
+    """
+    fmt = os.path.splitext(path)[1][1:].upper()
+    reader = _READERS.get(fmt)
+    if reader is None:
+        return ''
+    try:
+        toc, text = reader(path, max_bytes)
+    except Exception as e:
+        print(f"[SmartSummary] Excerpt extraction failed for {path}: {e}")
+        return ''
+    parts = []
+    if toc:
+        parts.append("Table of Contents: " + "; ".join(toc))
+    if text:
+        parts.append(_truncate(text, max_bytes))
+    return "\n\n".join(parts)
+
+
+class ExcerptCache:
+    """Small LRU keyed by (path, mtime, budget) so edited files are re-read."""
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_extract(self, path, max_bytes):
+        try:
+            key = (path, os.path.getmtime(path), max_bytes)
+        except OSError:
+            return ''
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        text = read_excerpt(path, max_bytes)
+        with self._lock:
+            self._data[key] = text
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return text
+
+
+_cache = ExcerptCache()
+
+
+class ExcerptExtractor:
+    """
+    Runs extraction off the GUI thread ahead of the API calls, so a batch's
+    file reads overlap with network latency. Threads, not processes: plugin
+    modules cannot be imported by spawned child processes inside Calibre,
+    and zlib inflate and file reads release the GIL anyway.
+    """
+    def __init__(self, max_bytes, max_workers=2):
+        self.max_bytes = max_bytes
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, path):
+        return self._executor.submit(_cache.get_or_extract, path, self.max_bytes)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,128 @@
+"""
+@Input:  Review Rows (book, old/new summary, model, tokens, timings, decision) / JSONL File
+@Output: Streamed JSONL Export, Chunked Bulk Apply via new_api.set_field (unknown fields skipped)
+@Pos:    infrastructure / exchange.py. File & DB Adapter for offline review.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import json
+
+EXPORT_FIELDS = ('book_id', 'uuid', 'title', 'old_summary', 'new_summary',
+                 'model', 'tokens', 'elapsed', 'decision', 'fields')
+
+APPLY_CHUNK = 500
+
+
+def export_rows(path, rows):
+    """
+    Writes one JSON object per line as rows are produced, so exporting
+    tens of thousands of summaries never holds the whole file in memory.
+    Returns the number of rows written.
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({k: row.get(k) for k in EXPORT_FIELDS}, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def iter_rows(path):
+    """Yields rows one line at a time; malformed lines are reported and skipped."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[SmartSummary] Skipping line {lineno} of {path}: {e}")
+
+
+def merge_tags(api, val_map):
+    """Adds suggested tags to each book's existing tags instead of replacing them."""
+    merged = {}
+    for book_id, tags in val_map.items():
+        current = list(api.field_for('tags', book_id) or ())
+        merged[book_id] = current + [t for t in tags if t not in current]
+    return merged
+
+
+def writable_fields(api):
+    """
+    Extra fields an import may write in this library: 'tags' and its custom
+    columns, mapped to their list separator (None for single-value fields).
+    """
+    fm = api.field_metadata
+    fields = {}
+    for name in ['tags'] + list(fm.custom_field_keys()):
+        multiple = fm[name].get('is_multiple') or {}
+        fields[name] = multiple.get('ui_to_list', ',') if multiple else None
+    return fields
+
+
+def _as_list(value, separator):
+    # Hand-edited files may hold "a, b" where a list is expected.
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(separator) if v.strip()]
+    return list(value or ())
+
+
+def apply_rows(db, rows, chunk_size=APPLY_CHUNK):
+    """
+    Applies rows marked 'apply' to the comments field, one bulk set_field
+    per chunk, plus one per extra field ('fields'). Books are matched by
+    uuid first (works on another copy of the library), then by id.
+    Extra fields this library does not have are skipped and counted.
+    Returns (applied_ids, skipped_count, {skipped_field: count}).
+    """
+    api = db.new_api
+    existing = api.all_book_ids()
+    known_fields = writable_fields(api)
+    applied, skipped = [], 0
+    skipped_fields = {}
+    pending = {}
+    pending_fields = {}
+
+    def flush():
+        if pending:
+            api.set_field('comments', pending)
+            applied.extend(pending)
+            pending.clear()
+        for field, val_map in pending_fields.items():
+            try:
+                api.set_field(field, merge_tags(api, val_map) if field == 'tags' else val_map)
+            except Exception as e:
+                print(f"[SmartSummary] Failed to import {field}: {e}")
+                skipped_fields[field] = skipped_fields.get(field, 0) + len(val_map)
+        pending_fields.clear()
+
+    for row in rows:
+        if row.get('decision') != 'apply' or not row.get('new_summary'):
+            skipped += 1
+            continue
+        book_id = None
+        if row.get('uuid'):
+            book_id = api.lookup_by_uuid(row['uuid'])
+        if book_id is None and row.get('book_id') in existing:
+            # Without a uuid match, only trust the id if the title agrees.
+            if not row.get('uuid') or api.field_for('title', row['book_id']) == row.get('title'):
+                book_id = row['book_id']
+        if book_id is None:
+            skipped += 1
+            continue
+        pending[book_id] = row['new_summary']
+        for field, value in (row.get('fields') or {}).items():
+            if field not in known_fields:
+                skipped_fields[field] = skipped_fields.get(field, 0) + 1
+                continue
+            if known_fields[field] is not None:
+                value = _as_list(value, known_fields[field])
+            pending_fields.setdefault(field, {})[book_id] = value
+        if len(pending) >= chunk_size:
+            flush()
+    flush()
+    return applied, skipped, skipped_fields
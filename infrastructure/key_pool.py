@@ -0,0 +1,93 @@
+"""
+@Input:  Model Config (key pool), Per-key Quota, HTTP Status Feedback
+@Output: Least-loaded API Key Lease
+@Pos:    infrastructure / key_pool.py. Adapter-side key balancer.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import threading
+import time
+from calibre_plugins.smart_summary_pro.core.config import get_model_keys
+from calibre_plugins.smart_summary_pro.core.quota import key_fingerprint
+
+
+class KeyPool:
+    """
+    Hands out keys of a model's pool, least-loaded first (in-flight
+    requests, then today's usage), rotating between equal keys.
+    Keys answering 401/403 or 429 are evicted for a while.
+    """
+    AUTH_EVICT_SECONDS = 3600   # Bad key: keep it out for an hour
+    RATE_EVICT_SECONDS = 60     # Rate limited: short cool-down
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}     # (model_id, fp) -> int
+        self._evicted = {}       # (model_id, fp) -> monotonic deadline
+        self._rotation = {}      # model_id -> int
+
+    def acquire(self, model_conf, quota_mgr):
+        """
+        Returns (api_key, fingerprint) or (None, None) if every key of the
+        pool is evicted or out of quota. One request of quota is reserved on
+        the returned key; pair with release(), and refund it on failure.
+        """
+        model_id = model_conf.get('id')
+        keys = get_model_keys(model_conf)
+        if not keys:
+            return None, None
+        now = time.monotonic()
+        with self._lock:
+            start = self._rotation.get(model_id, 0)
+            self._rotation[model_id] = start + 1
+            candidates = []
+            for i in range(len(keys)):
+                key = keys[(start + i) % len(keys)]
+                fp = key_fingerprint(key)
+                slot = (model_id, fp)
+                if self._evicted.get(slot, 0) > now:
+                    continue
+                load = (self._in_flight.get(slot, 0), quota_mgr.key_usage(model_id, fp))
+                candidates.append((load, i, key, fp))
+            # Least loaded first; the stable index keeps the rotation as tiebreaker.
+            for _, _, key, fp in sorted(candidates):
+                if quota_mgr.reserve(model_id, fp):
+                    self._in_flight[(model_id, fp)] = self._in_flight.get((model_id, fp), 0) + 1
+                    return key, fp
+            return None, None
+
+    def release(self, model_id, fingerprint):
+        with self._lock:
+            slot = (model_id, fingerprint)
+            count = self._in_flight.get(slot, 0) - 1
+            if count > 0:
+                self._in_flight[slot] = count
+            else:
+                self._in_flight.pop(slot, None)
+
+    def evict(self, model_id, fingerprint, seconds):
+        with self._lock:
+            self._evicted[(model_id, fingerprint)] = time.monotonic() + seconds
+        print(f"[SmartSummary] Key {fingerprint} of {model_id} evicted for {seconds}s.")
+
+    def has_available(self, model_conf):
+        """True if at least one key of the pool is not evicted."""
+        model_id = model_conf.get('id')
+        now = time.monotonic()
+        with self._lock:
+            return any(self._evicted.get((model_id, key_fingerprint(k)), 0) <= now
+                       for k in get_model_keys(model_conf))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_key_pool():
+    """Process-wide pool so evictions and load survive across jobs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KeyPool()
+        return _pool
@@ -0,0 +1,67 @@
+"""
+@Input:  Local OpenAI-compatible Endpoint (llama.cpp / vLLM style server)
+@Output: Server Slot Capacity (parallel sequences) for concurrency sizing
+@Pos:    infrastructure / local_backend.py. Local Inference Adapter.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+PROBE_TIMEOUT = 2.0
+PROBE_TTL = 300.0  # Re-probe every few minutes in case the server restarts
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _server_root(endpoint):
+    parts = urllib.parse.urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _get_json(url):
+    with urllib.request.urlopen(url, timeout=PROBE_TIMEOUT) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def _probe(endpoint):
+    root = _server_root(endpoint)
+    # llama.cpp server: /props reports total_slots; /slots lists them.
+    try:
+        props = _get_json(root + '/props')
+        if isinstance(props, dict) and props.get('total_slots'):
+            return int(props['total_slots'])
+    except (OSError, http.client.HTTPException, ValueError):
+        pass
+    try:
+        slots = _get_json(root + '/slots')
+        if isinstance(slots, list) and slots:
+            return len(slots)
+    except (OSError, http.client.HTTPException, ValueError):
+        pass
+    return None
+
+
+def probe_slots(endpoint):
+    """
+    Returns how many requests the local server can decode in parallel, or
+    None if it does not say (e.g. vLLM; the model's own setting is used then).
+    Results are cached per endpoint.
+    """
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(endpoint)
+        if hit is not None and now - hit[0] < PROBE_TTL:
+            return hit[1]
+    slots = _probe(endpoint)
+    if slots is not None:
+        print(f"[SmartSummary] Local server {endpoint} reports {slots} slot(s).")
+    with _lock:
+        _cache[endpoint] = (now, slots)
+    return slots
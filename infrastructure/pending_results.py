@@ -0,0 +1,49 @@
+"""
+@Input:  Background Generation Results awaiting review, Library ID
+@Output: Pending Results Sidecar Store (survives restarts until reviewed)
+@Pos:    infrastructure / pending_results.py. Sidecar DB Adapter.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+from calibre.utils.config import JSONConfig
+
+
+class PendingResults:
+    """
+    Background summaries waiting for the user's review, one section per
+    library. The auto-generation watermark has already moved past these
+    books, so they are kept on disk until the review dialog is accepted.
+    """
+    def __init__(self, library_id):
+        self.store = JSONConfig('plugins/SmartSummaryPro_background')
+        self.library_id = str(library_id)
+
+    def _raw(self):
+        return self.store.get(self.library_id, {})
+
+    def entries(self):
+        """{ book_id: result entry from collect_results() }"""
+        return {int(bid): entry for bid, entry in self._raw().items()}
+
+    def count(self):
+        return len(self._raw())
+
+    def add(self, successes):
+        if not successes:
+            return
+        raw = self._raw()
+        for book_id, entry in successes.items():
+            raw[str(book_id)] = entry
+        self.store[self.library_id] = raw
+
+    def remove(self, book_ids):
+        raw = self._raw()
+        gone = [raw.pop(str(bid)) for bid in book_ids if str(bid) in raw]
+        if not gone:
+            return
+        if raw:
+            self.store[self.library_id] = raw
+        else:
+            # JSONConfig saves on deletion as well as on assignment.
+            del self.store[self.library_id]
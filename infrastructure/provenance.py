@@ -0,0 +1,77 @@
+"""
+@Input:  Applied Summaries (book, model, prompt, metadata fingerprints)
+@Output: Provenance Sidecar Store, Staleness Verdicts
+@Pos:    infrastructure / provenance.py. Sidecar DB Adapter.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import datetime
+import hashlib
+import json
+from calibre.utils.config import JSONConfig
+
+# Metadata that feeds the prompt. 'comments' is left out: it is what we write.
+FINGERPRINT_FIELDS = ('title', 'authors', 'publisher', 'pubdate', 'series',
+                      'series_index', 'tags', 'languages')
+
+
+def _digest(obj):
+    data = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def metadata_fingerprint(mi_dict):
+    return _digest({f: mi_dict.get(f) for f in FINGERPRINT_FIELDS})
+
+
+def prompt_fingerprint(system_prompt, user_prompt):
+    return _digest([system_prompt or "", user_prompt or ""])
+
+
+class ProvenanceIndex:
+    """
+    Records which summaries were AI-generated, by which model and prompt
+    version, from which metadata. Stored next to the plugin prefs, one
+    section per library.
+    """
+    def __init__(self, library_id):
+        self.store = JSONConfig('plugins/SmartSummaryPro_provenance')
+        self.library_id = str(library_id)
+        self.entries = self.store.get(self.library_id, {})
+
+    def get(self, book_id):
+        return self.entries.get(str(book_id))
+
+    def record_many(self, records):
+        """
+        :param records: { book_id: {'model_id', 'model_name', 'prompt', 'metadata'} }
+        Written in one save, so a large batch costs a single file write.
+        """
+        if not records:
+            return
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        for book_id, rec in records.items():
+            entry = dict(rec)
+            entry['generated_at'] = now
+            self.entries[str(book_id)] = entry
+        self.store[self.library_id] = self.entries
+
+    def stale_reason(self, book_id, has_summary, meta_fp, prompt_fp, models):
+        """
+        Returns why a book needs (re)generation, or None if it is current.
+        Books with a summary that was not AI-generated are left alone.
+        """
+        if not has_summary:
+            return 'missing'
+        entry = self.get(book_id)
+        if entry is None:
+            return None
+        if entry.get('metadata') != meta_fp:
+            return 'metadata'
+        if entry.get('prompt') != prompt_fp:
+            return 'prompt'
+        current = {m.get('id'): m.get('model_name') for m in models}
+        if current.get(entry.get('model_id')) != entry.get('model_name'):
+            return 'model'
+        return None
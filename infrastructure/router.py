@@ -0,0 +1,158 @@
+"""
+@Input:  Configured Models, Observed Latency/Errors, Remaining Quota
+@Output: Per-request Model Order (weighted), Adaptive Timeouts
+@Pos:    infrastructure / router.py. Adapter-side load balancer.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import collections
+import random
+import threading
+
+
+class ModelStats:
+    """Rolling health figures for a single model (EWMA based)."""
+    __slots__ = ('latency', 'error_rate', 'calls', 'samples')
+
+    def __init__(self):
+        self.latency = None      # EWMA seconds, None until first success
+        self.error_rate = 0.0    # EWMA of failures, 0.0 .. 1.0
+        self.calls = 0
+        self.samples = collections.deque(maxlen=50)  # Recent latencies for timeouts
+
+
+class ModelRouter:
+    """
+    Distributes requests across all eligible models instead of always
+    draining the primary. Each model gets a weight of
+    (1 - error_rate) / latency, scaled down when its quota runs low.
+    Priority order is kept as the tiebreaker and every eligible model
+    keeps a minimum share so stale stats get refreshed.
+    """
+    ALPHA = 0.3                # EWMA smoothing factor
+    DEFAULT_LATENCY = 10.0     # Assumed seconds for models without samples
+    MIN_SHARE = 0.05           # Floor weight relative to the best model
+    LOW_QUOTA_FRACTION = 0.2   # Below this share of the limit, weight tapers off
+
+    # Adaptive request timeout: p95 of recent latencies times a margin, clamped.
+    TIMEOUT_DEFAULT = 60.0
+    TIMEOUT_FLOOR = 10.0
+    TIMEOUT_CEILING = 180.0
+    TIMEOUT_MARGIN = 2.5
+    TIMEOUT_MIN_SAMPLES = 5
+    # Local servers may decode on a CPU: far longer, and they never rate limit.
+    LOCAL_TIMEOUT_DEFAULT = 600.0
+    LOCAL_TIMEOUT_CEILING = 1800.0
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model_id):
+        stats = self._stats.get(model_id)
+        if stats is None:
+            stats = self._stats[model_id] = ModelStats()
+        return stats
+
+    def record_success(self, model_id, latency):
+        with self._lock:
+            s = self._get(model_id)
+            s.calls += 1
+            s.samples.append(latency)
+            if s.latency is None:
+                s.latency = latency
+            else:
+                s.latency = self.ALPHA * latency + (1 - self.ALPHA) * s.latency
+            s.error_rate = (1 - self.ALPHA) * s.error_rate
+
+    def record_failure(self, model_id):
+        with self._lock:
+            s = self._get(model_id)
+            s.calls += 1
+            s.error_rate = self.ALPHA + (1 - self.ALPHA) * s.error_rate
+
+    def timeout_for(self, model_id, local=False):
+        """Request timeout derived from the model's observed latency distribution."""
+        with self._lock:
+            s = self._stats.get(model_id)
+            samples = sorted(s.samples) if s is not None else []
+        default = self.LOCAL_TIMEOUT_DEFAULT if local else self.TIMEOUT_DEFAULT
+        ceiling = self.LOCAL_TIMEOUT_CEILING if local else self.TIMEOUT_CEILING
+        if len(samples) < self.TIMEOUT_MIN_SAMPLES:
+            return default
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(ceiling, max(self.TIMEOUT_FLOOR, p95 * self.TIMEOUT_MARGIN))
+
+    def expected_latency(self, model_id):
+        """EWMA latency, or 0 when the model has no history yet."""
+        with self._lock:
+            s = self._stats.get(model_id)
+            return s.latency if s is not None and s.latency is not None else 0.0
+
+    def snapshot(self):
+        """Returns {model_id: (latency, error_rate, calls)} for display/debugging."""
+        with self._lock:
+            return {mid: (s.latency, s.error_rate, s.calls) for mid, s in self._stats.items()}
+
+    def weight(self, model_id, remaining=None, limit=0):
+        with self._lock:
+            s = self._stats.get(model_id)
+            known = [x.latency for x in self._stats.values() if x.latency is not None]
+            latency = s.latency if s is not None and s.latency is not None else None
+            error_rate = s.error_rate if s is not None else 0.0
+        if latency is None:
+            # Unknown models are assumed average so they get explored.
+            latency = sum(known) / len(known) if known else self.DEFAULT_LATENCY
+        w = (1.0 - error_rate) / max(latency, 0.05)
+        if remaining is not None and limit > 0:
+            threshold = max(1.0, limit * self.LOW_QUOTA_FRACTION)
+            w *= min(1.0, remaining / threshold)
+        return w
+
+    def order(self, models, quota_mgr):
+        """
+        Returns the models to try for one request, best pick first.
+        Models with no remaining quota are left out entirely.
+        """
+        candidates = []
+        for priority, model in enumerate(models):
+            model_id = model.get('id')
+            remaining = quota_mgr.remaining(model_id)
+            if remaining is not None and remaining <= 0:
+                continue
+            # Pool-scaled, like 'remaining': daily_limit itself is per key.
+            limit = quota_mgr.daily_limit(model_id)
+            candidates.append([self.weight(model_id, remaining, limit), priority, model])
+
+        if len(candidates) <= 1:
+            return [c[2] for c in candidates]
+
+        best = max(c[0] for c in candidates)
+        for c in candidates:
+            c[0] = max(c[0], best * self.MIN_SHARE)
+
+        # Weighted draw for the first pick, the rest by weight then priority.
+        total = sum(c[0] for c in candidates)
+        r = random.uniform(0, total)
+        first = candidates[-1]
+        for c in candidates:
+            r -= c[0]
+            if r <= 0:
+                first = c
+                break
+        rest = sorted((c for c in candidates if c is not first), key=lambda c: (-c[0], c[1]))
+        return [first[2]] + [c[2] for c in rest]
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Process-wide router so observed stats survive across jobs."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
@@ -1,11 +1,12 @@
 """
-@Input:  Generated Summaries, Existing Metadata
+@Input:  Generated Summaries, Existing Metadata, Pre-rendered Diffs
 @Output: User Approval/Rejection State
 @Pos:    interfaces / dialogs.py. Gateway View Layer.
 
 !!! Maintenance Protocol: If logic, dependencies, or output change, 
 !!! update this header AND the parent directory's _DIR_META.md.
 """
+import html
 try:
     from qt.core import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QTextBrowser, QTextEdit, QPushButton, QSplitter, QWidget, Qt)
@@ -69,9 +70,14 @@ class ReviewDialog(QDialog):
         self.layout.addLayout(btn_layout)
 
 class BatchReviewDialog(QDialog):
-    def __init__(self, parent, results_map):
+    SIMILAR_THRESHOLD = 0.9
+
+    def __init__(self, parent, results_map, export_handler=None):
         """
         :param results_map: Dict { book_id: {'title': str, 'content': str, 'old_content': str} }
+            Entries may also carry 'similarity', 'old_html' and 'new_html'
+            prepared by the workers (see modules/review.py).
+        :param export_handler: Optional callable(decisions) behind the Export button.
         """
         super().__init__(parent)
         self.setWindowTitle(f"Review Summaries ({len(results_map)} books)")
@@ -127,6 +133,11 @@ class BatchReviewDialog(QDialog):
         splitter.addWidget(right_widget)
         self.layout.addWidget(splitter)
         
+        # Extra fields generated in the same request (tags, custom columns)
+        self.fields_label = QLabel("")
+        self.fields_label.setWordWrap(True)
+        self.layout.addWidget(self.fields_label)
+        
         # Action Bar for Current Book
         action_layout = QHBoxLayout()
         action_layout.addWidget(QLabel("Action for this book:"))
@@ -148,11 +159,21 @@ class BatchReviewDialog(QDialog):
         
         action_layout.addWidget(self.action_grp)
         action_layout.addStretch()
+        
+        # Bulk action driven by the precomputed similarity scores
+        self.similar_btn = QPushButton(f"Discard All ≥ {int(self.SIMILAR_THRESHOLD * 100)}% Similar to Current")
+        self.similar_btn.clicked.connect(self.discard_similar)
+        self.similar_btn.setEnabled(any('similarity' in d for d in results_map.values()))
+        action_layout.addWidget(self.similar_btn)
         self.layout.addLayout(action_layout)
         
         # Bottom Global Buttons
         self.layout.addStretch()
         bbox = QHBoxLayout()
+        if export_handler is not None:
+            self.export_btn = QPushButton("Export to File...")
+            self.export_btn.clicked.connect(lambda: export_handler(self.decisions))
+            bbox.addWidget(self.export_btn)
         self.save_all_btn = QPushButton(f"Process All")
         self.save_all_btn.clicked.connect(self.accept)
         bbox.addStretch()
@@ -166,10 +187,24 @@ class BatchReviewDialog(QDialog):
         data = self.results_map[book_id]
         
         self.setWindowTitle(f"Review: {data['title']}")
-        self.counter_label.setText(f"{self.current_index + 1} / {len(self.book_ids)}")
+        counter = f"{self.current_index + 1} / {len(self.book_ids)}"
+        if 'similarity' in data:
+            counter += f"  ({data['similarity']:.0%} similar to current)"
+        self.counter_label.setText(counter)
+        
+        if 'old_html' in data:
+            # Pre-rendered word-level diff: removed words left, added words right
+            self.old_view.setHtml(data['old_html'])
+            self.new_view.setHtml(data['new_html'])
+        else:
+            self.old_view.setHtml(data['old_content'] if data['old_content'] else "<i>No existing summary.</i>")
+            self.new_view.setHtml(data['content'])
         
-        self.old_view.setHtml(data['old_content'] if data['old_content'] else "<i>No existing summary.</i>")
-        self.new_view.setHtml(data['content'])
+        fields = data.get('fields') or {}
+        self.fields_label.setVisible(bool(fields))
+        self.fields_label.setText("<br>".join(
+            f"<b>{html.escape(name)}:</b> {html.escape(', '.join(map(str, value)) if isinstance(value, list) else str(value))}"
+            for name, value in fields.items()))
         
         # Update buttons state
         current_decision = self.decisions[book_id]
@@ -201,3 +236,12 @@ class BatchReviewDialog(QDialog):
         book_id = self.book_ids[self.current_index]
         self.decisions[book_id] = decision
         self.update_view()
+
+    def discard_similar(self):
+        count = 0
+        for book_id, data in self.results_map.items():
+            if data.get('similarity', 0) >= self.SIMILAR_THRESHOLD and self.decisions[book_id] != 'discard':
+                self.decisions[book_id] = 'discard'
+                count += 1
+        self.similar_btn.setText(f"Discarded {count} nearly identical")
+        self.update_view()
@@ -0,0 +1,328 @@
+"""
+@Input:  User Preferences (GUI)
+@Output: Persisted Model & Prompt Settings
+@Pos:    interfaces / settings.py. Configuration Gateway.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+try:
+    from qt.core import (QWidget, QVBoxLayout, QLabel, QTextEdit, QTabWidget, 
+                         QTableWidget, QTableWidgetItem, QPushButton, QHBoxLayout, 
+                         QDialog, QFormLayout, QLineEdit, QComboBox, QMessageBox,
+                         QAbstractItemView, QHeaderView, QCheckBox, Qt)
+except ImportError:
+    # Fallback for very old Calibre or external testing
+    from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QTextEdit, QTabWidget, 
+                                 QTableWidget, QTableWidgetItem, QPushButton, QHBoxLayout, 
+                                 QDialog, QFormLayout, QLineEdit, QComboBox, QMessageBox,
+                                 QAbstractItemView, QHeaderView, QCheckBox)
+    from PyQt5.QtCore import Qt
+from calibre_plugins.smart_summary_pro.core.config import prefs, obfuscate_key, get_model_keys
+
+class ModelEditDialog(QDialog):
+    def __init__(self, parent=None, model_data=None):
+        super().__init__(parent)
+        self.setWindowTitle("Configure AI Model")
+        self.layout = QFormLayout()
+        self.setLayout(self.layout)
+        
+        self.name_edit = QLineEdit(model_data.get('name', '') if model_data else '')
+        self.provider_edit = QComboBox()
+        self.provider_edit.addItems(["OpenAI", "DeepSeek", "Anthropic", "Gemini", "Local", "Custom"])
+        self.provider_edit.currentTextChanged.connect(self.on_provider_changed)
+        
+        if model_data:
+            self.provider_edit.setCurrentText(model_data.get('provider', 'OpenAI'))
+            
+        self.key_edit = QLineEdit()
+        if model_data:
+            # Keys are stored "ENC:" prefixed; legacy plain keys are shown as-is.
+            # A model may hold a pool of keys, edited here comma-separated.
+            self.key_edit.setText(", ".join(get_model_keys(model_data)))
+        
+        self.key_edit.setEchoMode(QLineEdit.Password)
+        
+        self.endpoint_edit = QLineEdit(model_data.get('endpoint', 'https://api.openai.com/v1/chat/completions') if model_data else 'https://api.openai.com/v1/chat/completions')
+        self.model_name_edit = QLineEdit(model_data.get('model_name', 'gpt-3.5-turbo') if model_data else 'gpt-3.5-turbo')
+        self.limit_edit = QLineEdit(str(model_data.get('daily_limit', 10)) if model_data else '10')
+        self.context_edit = QLineEdit(str(model_data.get('context_window', 0)) if model_data else '0')
+        self.concurrency_edit = QLineEdit(str(model_data.get('max_concurrency', 3)) if model_data else '3')
+
+        self.layout.addRow("Friendly Name:", self.name_edit)
+        self.layout.addRow("Provider:", self.provider_edit)
+        self.layout.addRow("API Key(s), comma-separated:", self.key_edit)
+        self.layout.addRow("Endpoint URL:", self.endpoint_edit)
+        self.layout.addRow("Model String (e.g. gpt-4):", self.model_name_edit)
+        self.layout.addRow("Daily Request Limit (per key):", self.limit_edit)
+        self.layout.addRow("Context Window (tokens, 0 = default):", self.context_edit)
+        self.layout.addRow("Max Concurrent Requests:", self.concurrency_edit)
+        
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.accept)
+    def on_provider_changed(self, provider):
+        defaults = {
+            "OpenAI": "https://api.openai.com/v1/chat/completions",
+            "DeepSeek": "https://api.deepseek.com/chat/completions",
+            "Gemini": "https://generativelanguage.googleapis.com/v1beta/openai/chat/completions",
+            # llama.cpp server default; slots are read from the server itself
+            "Local": "http://127.0.0.1:8080/v1/chat/completions"
+        }
+        
+        # Only overwrite if current is empty or matches a known default
+        current = self.endpoint_edit.text().strip()
+        known_defaults = list(defaults.values()) + ["https://api.openai.com/v1/chat/completions"]
+        
+        if not current or current in known_defaults:
+            if provider in defaults:
+                self.endpoint_edit.setText(defaults[provider])
+
+        self.layout.addRow(self.save_btn)
+
+    def get_data(self):
+        import uuid
+        
+        raw_keys = [k.strip() for k in self.key_edit.text().replace("\n", ",").split(",") if k.strip()]
+        # Save as "ENC:" + obfuscated
+        enc_keys = ["ENC:" + obfuscate_key(k) for k in raw_keys]
+        
+        return {
+            'id': str(uuid.uuid4()), 
+            'name': self.name_edit.text(),
+            'provider': self.provider_edit.currentText(),
+            'api_key': enc_keys[0] if enc_keys else "ENC:",
+            'api_keys': enc_keys,
+            'endpoint': self.endpoint_edit.text(),
+            'model_name': self.model_name_edit.text(),
+            'daily_limit': int(self.limit_edit.text()),
+            'context_window': int(self.context_edit.text() or 0),
+            'max_concurrency': max(1, int(self.concurrency_edit.text() or 3))
+        }
+
+class ConfigWidget(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+        
+        self.tabs = QTabWidget()
+        self.layout.addWidget(self.tabs)
+        
+        self.setup_models_tab()
+        self.setup_prompt_tab()
+        self.setup_automation_tab()
+
+    def setup_models_tab(self):
+        self.models_tab = QWidget()
+        l = QVBoxLayout()
+        self.models_tab.setLayout(l)
+        
+        self.model_table = QTableWidget()
+        self.model_table.setColumnCount(4)
+        self.model_table.setHorizontalHeaderLabels(["Priority", "Name", "Provider", "Daily Limit"])
+        
+        # Handle PyQt6 compatibility for QHeaderView.Stretch
+        # In PyQt6 it is QHeaderView.ResizeMode.Stretch, in PyQt5 it is QHeaderView.Stretch
+        # Both map to integer 1 usually.
+        try:
+            stretch_mode = QHeaderView.Stretch
+        except AttributeError:
+             # Likely PyQt6
+             try:
+                 stretch_mode = QHeaderView.ResizeMode.Stretch
+             except AttributeError:
+                 # Fallback
+                 stretch_mode = 1
+
+        self.model_table.horizontalHeader().setSectionResizeMode(1, stretch_mode)
+        self.model_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.model_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        l.addWidget(self.model_table)
+        
+        btn_layout = QHBoxLayout()
+        add_btn = QPushButton("Add Model")
+        add_btn.clicked.connect(self.add_model)
+        edit_btn = QPushButton("Edit")
+        edit_btn.clicked.connect(self.edit_model)
+        del_btn = QPushButton("Remove")
+        del_btn.clicked.connect(self.delete_model)
+        up_btn = QPushButton("Move Up")
+        up_btn.clicked.connect(lambda: self.move_row(-1))
+        down_btn = QPushButton("Move Down")
+        down_btn.clicked.connect(lambda: self.move_row(1))
+        
+        btn_layout.addWidget(add_btn)
+        btn_layout.addWidget(edit_btn)
+        btn_layout.addWidget(del_btn)
+        btn_layout.addWidget(up_btn)
+        btn_layout.addWidget(down_btn)
+        l.addLayout(btn_layout)
+
+        routing_layout = QHBoxLayout()
+        routing_layout.addWidget(QLabel("Routing:"))
+        self.routing_combo = QComboBox()
+        self.routing_combo.addItem("Balanced (latency, errors and quota aware)", 'balanced')
+        self.routing_combo.addItem("Strict priority order (failover only)", 'priority')
+        idx = self.routing_combo.findData(prefs.get('routing_policy', 'balanced'))
+        self.routing_combo.setCurrentIndex(max(idx, 0))
+        routing_layout.addWidget(self.routing_combo, 1)
+        l.addLayout(routing_layout)
+
+        deadline_layout = QHBoxLayout()
+        deadline_layout.addWidget(QLabel("Per-book deadline (s, 0 = none):"))
+        self.book_deadline_edit = QLineEdit(str(prefs.get('book_deadline', 300)))
+        deadline_layout.addWidget(self.book_deadline_edit)
+        deadline_layout.addWidget(QLabel("Per-job deadline (min, 0 = none):"))
+        self.job_deadline_edit = QLineEdit(str(prefs.get('job_deadline', 0)))
+        deadline_layout.addWidget(self.job_deadline_edit)
+        l.addLayout(deadline_layout)
+        
+        self.tabs.addTab(self.models_tab, "Model Management")
+        self.refresh_table()
+
+    def setup_prompt_tab(self):
+        self.prompt_tab = QWidget()
+        l = QVBoxLayout()
+        self.prompt_tab.setLayout(l)
+        
+        # System Prompt (Role definition)
+        l.addWidget(QLabel("<b>System Prompt</b> (AI role and task definition):"))
+        self.system_prompt_edit = QTextEdit()
+        self.system_prompt_edit.setPlainText(prefs.get('system_prompt', ''))
+        self.system_prompt_edit.setMaximumHeight(150)
+        l.addWidget(self.system_prompt_edit)
+        
+        # User Prompt (Book info template)
+        l.addWidget(QLabel("<b>User Prompt</b> (Template with {title}, {authors}, {publisher}, {pubdate}, {series}, {series_index}, {tags}, {comments}, {languages}, {excerpt}):"))
+        self.user_prompt_edit = QTextEdit()
+        self.user_prompt_edit.setPlainText(prefs.get('user_prompt', ''))
+        l.addWidget(self.user_prompt_edit)
+        
+        # Excerpt stage: bounded text read from the book file for {excerpt}
+        excerpt_layout = QHBoxLayout()
+        self.excerpt_chk = QCheckBox("Read an excerpt from the book file for {excerpt} (EPUB/AZW3/MOBI/TXT)")
+        self.excerpt_chk.setChecked(prefs.get('excerpt_enabled', False))
+        excerpt_layout.addWidget(self.excerpt_chk, 1)
+        excerpt_layout.addWidget(QLabel("Max KB:"))
+        self.excerpt_kb_edit = QLineEdit(str(prefs.get('excerpt_kb', 8)))
+        self.excerpt_kb_edit.setMaximumWidth(60)
+        excerpt_layout.addWidget(self.excerpt_kb_edit)
+        l.addLayout(excerpt_layout)
+        
+        # Extra fields returned in the same request as the summary
+        fields_layout = QHBoxLayout()
+        fields_layout.addWidget(QLabel("Also generate (comma-separated, e.g. tags, #genre, #blurb):"))
+        self.output_fields_edit = QLineEdit(", ".join(prefs.get('output_fields', [])))
+        fields_layout.addWidget(self.output_fields_edit, 1)
+        l.addLayout(fields_layout)
+        
+        self.tabs.addTab(self.prompt_tab, "Prompt Template")
+
+    def setup_automation_tab(self):
+        self.automation_tab = QWidget()
+        l = QFormLayout()
+        self.automation_tab.setLayout(l)
+        
+        self.auto_chk = QCheckBox("Generate summaries for new books in the background")
+        self.auto_chk.setChecked(prefs.get('auto_generate_enabled', False))
+        l.addRow(self.auto_chk)
+        self.auto_search_edit = QLineEdit(prefs.get('auto_generate_search', ''))
+        self.auto_search_edit.setPlaceholderText("Empty = books added from now on, e.g. comments:false")
+        l.addRow("Search (optional):", self.auto_search_edit)
+        self.auto_batch_edit = QLineEdit(str(prefs.get('auto_generate_batch', 5)))
+        l.addRow("Books per batch:", self.auto_batch_edit)
+        self.auto_interval_edit = QLineEdit(str(prefs.get('auto_generate_interval', 10)))
+        l.addRow("Check every (minutes):", self.auto_interval_edit)
+        l.addRow(QLabel("Batches run only while no other generation is running and quota is left.\n"
+                        "Results are collected under 'Review background results' in the toolbar menu."))
+        
+        self.tabs.addTab(self.automation_tab, "Automation")
+
+    def refresh_table(self):
+        self.model_table.setRowCount(0)
+        configs = sorted(prefs.get('api_configs', []), key=lambda x: x.get('priority', 999))
+        # Ensure we assign sequential priorities in case it's the first time
+        for i, conf in enumerate(configs):
+            conf['priority'] = i + 1
+        prefs['api_configs'] = configs
+        for i, conf in enumerate(configs):
+            self.model_table.insertRow(i)
+            self.model_table.setItem(i, 0, QTableWidgetItem(str(conf.get('priority', i+1))))
+            self.model_table.setItem(i, 1, QTableWidgetItem(conf.get('name', '')))
+            self.model_table.setItem(i, 2, QTableWidgetItem(conf.get('provider', '')))
+            self.model_table.setItem(i, 3, QTableWidgetItem(str(conf.get('daily_limit', 0))))
+
+    def add_model(self):
+        dlg = ModelEditDialog(self)
+        if dlg.exec_() == QDialog.Accepted:
+            new_data = dlg.get_data()
+            configs = prefs.get('api_configs', [])
+            new_data['priority'] = len(configs) + 1
+            configs.append(new_data)
+            prefs['api_configs'] = configs
+            self.refresh_table()
+
+    def edit_model(self):
+        row = self.model_table.currentRow()
+        if row < 0: return
+        configs = prefs.get('api_configs', [])
+        data = configs[row]
+        
+        dlg = ModelEditDialog(self, data)
+        if dlg.exec_() == QDialog.Accepted:
+            updated_data = dlg.get_data()
+            updated_data['id'] = data.get('id', updated_data['id']) # Preserve ID
+            configs[row] = updated_data
+            prefs['api_configs'] = configs
+            self.refresh_table()
+
+    def delete_model(self):
+        row = self.model_table.currentRow()
+        if row < 0: return
+        configs = prefs.get('api_configs', [])
+        del configs[row]
+        for i, conf in enumerate(configs):
+            conf['priority'] = i + 1
+        prefs['api_configs'] = configs
+        self.refresh_table()
+
+    def move_row(self, direction):
+        row = self.model_table.currentRow()
+        if row < 0: return
+        new_row = row + direction
+        configs = prefs.get('api_configs', [])
+        if 0 <= new_row < len(configs):
+            configs[row], configs[new_row] = configs[new_row], configs[row]
+            for i, conf in enumerate(configs):
+                conf['priority'] = i + 1
+            prefs['api_configs'] = configs
+            self.refresh_table()
+            self.model_table.selectRow(new_row)
+
+    def save_settings(self):
+        from calibre_plugins.smart_summary_pro.modules.prompt import CompiledPrompt, PromptTemplateError
+        try:
+            CompiledPrompt(self.system_prompt_edit.toPlainText(), self.user_prompt_edit.toPlainText())
+        except PromptTemplateError as e:
+            QMessageBox.warning(self, "Prompt Template", f"The user prompt will be rejected at run time:\n{e}")
+        prefs['system_prompt'] = self.system_prompt_edit.toPlainText()
+        prefs['user_prompt'] = self.user_prompt_edit.toPlainText()
+        prefs['routing_policy'] = self.routing_combo.currentData()
+        try:
+            prefs['book_deadline'] = max(0, int(self.book_deadline_edit.text()))
+            prefs['job_deadline'] = max(0, int(self.job_deadline_edit.text()))
+        except ValueError:
+            pass
+        prefs['auto_generate_enabled'] = self.auto_chk.isChecked()
+        prefs['auto_generate_search'] = self.auto_search_edit.text().strip()
+        try:
+            prefs['auto_generate_batch'] = max(1, int(self.auto_batch_edit.text()))
+            prefs['auto_generate_interval'] = max(1, int(self.auto_interval_edit.text()))
+        except ValueError:
+            pass
+        prefs['output_fields'] = [f.strip() for f in self.output_fields_edit.text().split(',') if f.strip()]
+        prefs['excerpt_enabled'] = self.excerpt_chk.isChecked()
+        try:
+            prefs['excerpt_kb'] = max(1, int(self.excerpt_kb_edit.text()))
+        except ValueError:
+            pass
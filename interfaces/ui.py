@@ -8,6 +8,13 @@
 """
 from calibre.gui2.actions import InterfaceAction
 from calibre.gui2 import error_dialog
+try:
+    from qt.core import QMenu
+except ImportError:
+    from PyQt5.QtWidgets import QMenu
+
+# Keep this module import-light: it is loaded at every Calibre start.
+# Everything beyond the toolbar action itself is imported inside the handlers.
 
 class SmartSummaryProAction(InterfaceAction):
     name = 'SmartSummary Pro'
@@ -16,11 +23,27 @@ class SmartSummaryProAction(InterfaceAction):
     
     def genesis(self):
         self.qaction.triggered.connect(self.show_dialog)
-        print("SmartSummary Pro: genesis called")
+        self.menu = QMenu(self.gui)
+        self.create_menu_action(self.menu, 'smart-summary-generate',
+                                'Generate summaries for selected books', triggered=self.show_dialog)
+        self.create_menu_action(self.menu, 'smart-summary-stale',
+                                'Regenerate only stale summaries', triggered=self.show_stale_dialog)
+        self.background_action = self.create_menu_action(self.menu, 'smart-summary-background',
+                                'Review background results', triggered=self.show_background_review)
+        self.background_action.setEnabled(False)
+        self.create_menu_action(self.menu, 'smart-summary-import',
+                                'Import reviewed results...', triggered=self.import_results)
+        self.qaction.setMenu(self.menu)
+
+    # Deferred-queue polling interval (ms). The first check waits until
+    # Calibre has settled so the plugin adds nothing to startup.
+    DEFERRED_FIRST_CHECK_MS = 60 * 1000
+    DEFERRED_CHECK_MS = 5 * 60 * 1000
 
     def initialization_complete(self):
-        print("SmartSummary Pro: initialization_complete called")
         self.add_to_menu_bar()
+        self.schedule_deferred_check(self.DEFERRED_FIRST_CHECK_MS)
+        self.schedule_auto_check(self.DEFERRED_FIRST_CHECK_MS)
 
     def add_to_menu_bar(self):
         try:
@@ -45,18 +68,45 @@ class SmartSummaryProAction(InterfaceAction):
         if len(rows) > 0:
             menu.addAction(self.qaction)
 
-    def show_dialog(self):
+    def selected_book_ids(self):
         rows = self.gui.library_view.selectionModel().selectedRows()
-        if not rows: return
-        book_ids = list(map(self.gui.library_view.model().id, rows))
+        return list(map(self.gui.library_view.model().id, rows))
+
+    def show_dialog(self):
+        book_ids = self.selected_book_ids()
+        if not book_ids: return
+        self.start_generation(book_ids)
+
+    def show_stale_dialog(self):
+        """Regenerate only the selected books whose summary is missing or outdated."""
+        book_ids = self.selected_book_ids()
+        if not book_ids: return
         
         from calibre_plugins.smart_summary_pro.core.config import prefs
-        if not prefs.get('api_configs'):
-             error_dialog(self.gui, 'No API Configured', 'Please configure an AI model first.', show=True)
-             return
+        from calibre_plugins.smart_summary_pro.infrastructure.provenance import (
+            ProvenanceIndex, metadata_fingerprint, prompt_fingerprint)
+        db = self.gui.current_db
+        index = ProvenanceIndex(db.library_id)
+        prompt_fp = prompt_fingerprint(prefs.get('system_prompt'), prefs.get('user_prompt'))
+        models = prefs.get('api_configs', [])
+        
+        metadata_map = self.build_metadata_map(db, book_ids, excerpt_kb=0)
+        stale_ids = []
+        for book_id in book_ids:
+            mi_dict = metadata_map[book_id]
+            reason = index.stale_reason(book_id, bool(mi_dict.get('comments')),
+                                        metadata_fingerprint(mi_dict), prompt_fp, models)
+            if reason:
+                stale_ids.append(book_id)
+        
+        if not stale_ids:
+            self.gui.status_bar.showMessage(f"All {len(book_ids)} selected summaries are up to date.", 5000)
+            return
+        self.gui.status_bar.showMessage(f"{len(stale_ids)} of {len(book_ids)} selected summaries are stale.", 3000)
+        self.start_generation(stale_ids, {bid: metadata_map[bid] for bid in stale_ids})
 
+    def build_metadata_map(self, db, book_ids, excerpt_kb=0):
         # Pre-extract metadata on the main thread (Thread Safety Fix)
-        db = self.gui.current_db
         metadata_map = {}
         for book_id in book_ids:
             mi = db.get_metadata(book_id, index_is_id=True)
@@ -66,87 +116,338 @@ class SmartSummaryProAction(InterfaceAction):
                 'authors': authors,
                 'publisher': getattr(mi, 'publisher', "Unknown") or "Unknown",
                 'pubdate': str(getattr(mi, 'pubdate', "Unknown")) if getattr(mi, 'pubdate', None) else "Unknown",
-                'series': getattr(mi, 'series', "None") or "None"
+                'series': getattr(mi, 'series', "None") or "None",
+                'series_index': getattr(mi, 'series_index', None),
+                'tags': list(getattr(mi, 'tags', None) or []),
+                'comments': getattr(mi, 'comments', None),
+                'languages': list(getattr(mi, 'languages', None) or []),
             }
+        if excerpt_kb:
+            for book_id in book_ids:
+                metadata_map[book_id]['format_path'] = self.find_excerpt_source(db, book_id)
+        return metadata_map
+
+    def report_error(self, title, message, interactive=True):
+        """Dialog for user actions; background timers only log."""
+        if interactive:
+            error_dialog(self.gui, title, message, show=True)
+        else:
+            print(f"SmartSummary Pro: {title}: {message}")
+
+    def start_generation(self, book_ids, metadata_map=None, priority=None, on_finished=None,
+                         interactive=True):
+        """Submits a job to the engine. Returns the job, or None if it could not start."""
+        from calibre_plugins.smart_summary_pro.core.config import RunConfig
+        # Settings are read once here; the job keeps this snapshot to the end.
+        config = RunConfig()
+        if not config.models:
+             self.report_error('No API Configured', 'Please configure an AI model first.', interactive)
+             return None
+
+        db = self.gui.current_db
+        excerpt_kb = config.excerpt_kb
+        if metadata_map is None:
+            metadata_map = self.build_metadata_map(db, book_ids, excerpt_kb)
+        elif excerpt_kb:
+            for book_id in book_ids:
+                metadata_map[book_id]['format_path'] = self.find_excerpt_source(db, book_id)
 
         from calibre_plugins.smart_summary_pro.modules.worker import GenerationWorker
-        system_prompt = prefs.get('system_prompt')
-        user_prompt = prefs.get('user_prompt')
-        
-        # Instantiate pure worker without GUI object
-        job = GenerationWorker(book_ids, metadata_map, system_prompt, user_prompt)
-        
-        import threading
-        def run_in_background():
-            try:
-                job()
-            except Exception as e:
-                job.failed = True
-                job.results['fatal_error'] = str(e)
+        from calibre_plugins.smart_summary_pro.modules.prompt import PromptTemplateError
         
-        thread = threading.Thread(target=run_in_background, daemon=True)
-        thread.start()
+        # Instantiate pure worker without GUI object.
+        # Templates are compiled here, so a bad variable fails before any request.
+        try:
+            output_fields = self.build_output_fields(db, config.output_fields)
+            job = GenerationWorker(book_ids, metadata_map, config, output_fields=output_fields)
+        except PromptTemplateError as e:
+            self.report_error('Invalid Prompt Template', str(e), interactive)
+            return None
         
+        from calibre_plugins.smart_summary_pro.modules.engine import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+        # Single-book requests jump ahead of running batches.
+        if priority is None:
+            priority = PRIORITY_INTERACTIVE if len(book_ids) == 1 else PRIORITY_BATCH
+        self.get_engine().submit(job, priority)
+        self.watch_job(job, on_finished)
+        self.gui.status_bar.showMessage(f"Starting generation for {len(book_ids)} book(s)...", 1000)
+        return job
+
+    def build_output_fields(self, db, names):
+        """
+        Resolves the configured extra output fields against this library.
+        Only 'tags' and existing custom columns are accepted.
+        """
+        from calibre_plugins.smart_summary_pro.modules.prompt import PromptTemplateError
+        fm = db.new_api.field_metadata
+        custom = set(fm.custom_field_keys())
+        specs = []
+        for name in names:
+            if name == 'tags':
+                specs.append({'field': 'tags', 'label': 'Suggested tags', 'multiple': True, 'datatype': 'text'})
+            elif name in custom:
+                meta = fm[name]
+                specs.append({'field': name, 'label': meta.get('name', name),
+                              'multiple': bool(meta.get('is_multiple')), 'datatype': meta.get('datatype')})
+            else:
+                raise PromptTemplateError(f"Output field '{name}' is neither 'tags' nor a custom column of this library.")
+        return specs
+
+    def get_engine(self):
+        """The shared, long-lived generation engine (created on first use)."""
+        engine = getattr(self, 'engine', None)
+        if engine is None:
+            from calibre_plugins.smart_summary_pro.modules.engine import GenerationEngine
+            engine = self.engine = GenerationEngine()
+        return engine
+
+    def watch_job(self, job, on_finished=None):
         try:
             from qt.core import QTimer
         except ImportError:
             from PyQt5.QtCore import QTimer
         
         def check_completion():
-            if thread.is_alive():
+            if not job.is_finished():
                 # Report progress dynamically
                 self.gui.status_bar.showMessage(f"Generating summaries: {job.completed_count} / {job.total_count} completed...", 1000)
                 QTimer.singleShot(500, check_completion)
             else:
                 self.gui.status_bar.clearMessage()
-                self.job_finished(job)
+                (on_finished or self.job_finished)(job)
         
         QTimer.singleShot(500, check_completion)
-        self.gui.status_bar.showMessage(f"Starting generation for {len(book_ids)} book(s)...", 1000)
 
-    def job_finished(self, job):
-        if job.failed:
-            error_msg = job.results.get('fatal_error', 'Unknown error')
-            error_dialog(self.gui, 'Generation Failed', error_msg, show=True)
+    def schedule_deferred_check(self, delay_ms=None):
+        try:
+            from qt.core import QTimer
+        except ImportError:
+            from PyQt5.QtCore import QTimer
+        QTimer.singleShot(delay_ms or self.DEFERRED_CHECK_MS, self.resume_deferred)
+
+    def resume_deferred(self):
+        """
+        Re-queues quota-deferred books once the daily reset happened or a
+        model's limit frees up; results go through the normal review flow.
+        """
+        try:
+            from calibre_plugins.smart_summary_pro.modules.deferred import DeferredQueue
+            from calibre_plugins.smart_summary_pro.modules.engine import PRIORITY_BACKGROUND
+            db = self.gui.current_db
+            queue = DeferredQueue(db.library_id)
+            ready = queue.take_ready()
+            if ready:
+                existing = db.new_api.all_book_ids()
+                queue.complete([bid for bid in ready if bid not in existing])
+                ready = [bid for bid in ready if bid in existing]
+            if ready:
+                print(f"SmartSummary Pro: Resuming {len(ready)} deferred book(s).")
+                job = None
+                try:
+                    job = self.start_generation(ready, priority=PRIORITY_BACKGROUND, interactive=False)
+                finally:
+                    if job is None:
+                        # Not started (no model, bad template, ...): pending again.
+                        queue.release(ready)
+        except Exception as e:
+            print(f"SmartSummary Pro: Deferred queue check failed: {e}")
+        finally:
+            self.schedule_deferred_check()
+
+    def schedule_auto_check(self, delay_ms=None):
+        try:
+            from qt.core import QTimer
+        except ImportError:
+            from PyQt5.QtCore import QTimer
+        if not delay_ms:
+            # Not on the first call from initialization_complete: prefs stay
+            # unloaded until Calibre has settled.
+            from calibre_plugins.smart_summary_pro.core.config import prefs
+            delay_ms = max(1, prefs.get('auto_generate_interval', 10)) * 60 * 1000
+        QTimer.singleShot(delay_ms, self.auto_generate_tick)
+
+    def auto_generate_tick(self):
+        """Queues a small low-priority batch of new books while the engine is idle."""
+        try:
+            # Results left unreviewed by an earlier session, without loading
+            # the sidecar at startup.
+            self.refresh_background_action()
+            from calibre_plugins.smart_summary_pro.core.config import prefs
+            if prefs.get('auto_generate_enabled', False):
+                from calibre_plugins.smart_summary_pro.modules.watcher import AutoGenerationWatcher
+                from calibre_plugins.smart_summary_pro.modules.engine import PRIORITY_BACKGROUND
+                watcher = getattr(self, 'watcher', None)
+                if watcher is None:
+                    watcher = self.watcher = AutoGenerationWatcher()
+                batch = watcher.next_batch(self.gui.current_db, self.get_engine())
+                if batch:
+                    print(f"SmartSummary Pro: Auto-generating {len(batch)} new book(s).")
+                    db = self.gui.current_db
+                    job = self.start_generation(batch, priority=PRIORITY_BACKGROUND,
+                                                on_finished=self.background_job_finished,
+                                                interactive=False)
+                    if job is not None:
+                        watcher.mark_submitted(db, batch)
+        except Exception as e:
+            print(f"SmartSummary Pro: Auto-generation check failed: {e}")
+        finally:
+            self.schedule_auto_check()
+
+    def background_job_finished(self, job):
+        """Background results wait for the user instead of popping up a dialog."""
+        if job.failed or 'fatal_error' in job.results:
+            print(f"SmartSummary Pro: Background job failed: {job.results.get('fatal_error', '')}")
+            self.release_deferred(job)
             return
+        from calibre_plugins.smart_summary_pro.infrastructure.pending_results import PendingResults
+        successes, error_count, deferred_count = self.collect_results(job)
+        # On disk: the watermark is already past these books.
+        PendingResults(self.gui.current_db.library_id).add(successes)
+        count = self.refresh_background_action()
+        if successes:
+            self.gui.status_bar.showMessage(
+                f"SmartSummary: {count} background summaries ready for review.", 5000)
 
-        results = job.results
-        if 'fatal_error' in results:
-             error_dialog(self.gui, 'Generation Error', results['fatal_error'], show=True)
-             return
+    def refresh_background_action(self):
+        """Shows how many background results of the current library await review."""
+        from calibre_plugins.smart_summary_pro.infrastructure.pending_results import PendingResults
+        count = PendingResults(self.gui.current_db.library_id).count()
+        self.background_action.setText(
+            f"Review background results ({count})" if count else "Review background results")
+        self.background_action.setEnabled(count > 0)
+        return count
 
-        from calibre_plugins.smart_summary_pro.interfaces.dialogs import BatchReviewDialog
-        review_map = {}
+    def library_changed(self, db):
+        self.refresh_background_action()
+
+    def show_background_review(self):
+        from calibre_plugins.smart_summary_pro.infrastructure.pending_results import PendingResults
+        pending = PendingResults(self.gui.current_db.library_id)
+        entries = pending.entries()
+        existing = self.gui.current_db.new_api.all_book_ids()
+        pending.remove([bid for bid in entries if bid not in existing])
+        entries = {bid: res for bid, res in entries.items() if bid in existing}
+        # Kept until the dialog is accepted; a cancelled review can be reopened.
+        if entries and self.review_and_apply(entries):
+            pending.remove(entries)
+        self.refresh_background_action()
+
+    def find_excerpt_source(self, db, book_id):
+        """Path of the best format file to read an excerpt from, or None."""
+        from calibre_plugins.smart_summary_pro.infrastructure.excerpt import EXCERPT_FORMATS
+        try:
+            available = set(db.new_api.formats(book_id))
+            for fmt in EXCERPT_FORMATS:
+                if fmt in available:
+                    return db.new_api.format_abspath(book_id, fmt)
+        except Exception as e:
+            print(f"SmartSummary Pro: No excerpt source for {book_id}: {e}")
+        return None
+
+    def collect_results(self, job):
+        """
+        Splits a finished job into reviewable successes, failures and
+        quota-deferred books (which are parked in the deferred queue); queued
+        books leave the queue here, once they have a result.
+        Returns (successes, error_count, deferred_count); successes carry the
+        fingerprints needed for the provenance index.
+        """
+        from calibre_plugins.smart_summary_pro.infrastructure.provenance import (
+            metadata_fingerprint, prompt_fingerprint)
         db = self.gui.current_db
-        
+        prompt_fp = prompt_fingerprint(job.system_prompt, job.user_prompt)
+        successes = {}
         error_count = 0
-        success_count = 0
+        deferred_ids = []
+        self.last_deadline_count = 0
         
-        for book_id, res in results.items():
+        for book_id, res in job.results.items():
             if not isinstance(book_id, int): continue
             
+            if res.get('deferred'):
+                deferred_ids.append(book_id)
+                continue
+            
             if not res['success']:
                 print(f"Failed for {book_id}: {res.get('error', '')}")
                 error_count += 1
+                if res.get('deadline_exceeded'):
+                    self.last_deadline_count += 1
                 continue
             
-            success_count += 1
-            mi = db.get_metadata(book_id, index_is_id=True)
-            review_map[book_id] = {
-                'title': res['title'],
-                'content': res['content'],
-                'old_content': mi.comments
-            }
+            entry = dict(res)
+            entry['prompt_fp'] = prompt_fp
+            entry['source_metadata'] = job.metadata_map.get(book_id, {})
+            entry['metadata_fp'] = metadata_fingerprint(entry['source_metadata'])
+            successes[book_id] = entry
+        
+        from calibre_plugins.smart_summary_pro.modules.deferred import DeferredQueue
+        queue = DeferredQueue(db.library_id)
+        # Resumed deferred books leave the queue only now that they have a result.
+        queue.complete([bid for bid, res in job.results.items()
+                        if isinstance(bid, int) and not res.get('deferred')])
+        queue.add(deferred_ids)
+        queue.release(job.book_ids)
+        return successes, error_count, len(deferred_ids)
+
+    def release_deferred(self, job):
+        """A job that failed as a whole hands its resumed deferred books back."""
+        from calibre_plugins.smart_summary_pro.modules.deferred import DeferredQueue
+        DeferredQueue(self.gui.current_db.library_id).release(job.book_ids)
+
+    def job_finished(self, job):
+        if job.failed or 'fatal_error' in job.results:
+            self.release_deferred(job)
+        if job.failed:
+            error_msg = job.results.get('fatal_error', 'Unknown error')
+            error_dialog(self.gui, 'Generation Failed', error_msg, show=True)
+            return
+
+        results = job.results
+        if 'fatal_error' in results:
+             error_dialog(self.gui, 'Generation Error', results['fatal_error'], show=True)
+             return
+
+        successes, error_count, deferred_count = self.collect_results(job)
+        success_count = len(successes)
         
-        if error_count > 0:
-            self.gui.status_bar.showMessage(f"Generation complete. Success: {success_count}, Failed: {error_count}", 5000)
+        if error_count > 0 or deferred_count:
+            message = f"Generation complete. Success: {success_count}, Failed: {error_count}"
+            if self.last_deadline_count:
+                message += f" (deadline exceeded: {self.last_deadline_count})"
+            if deferred_count:
+                message += f", Deferred until quota frees up: {deferred_count}"
+            self.gui.status_bar.showMessage(message, 5000)
         
-        if not review_map:
+        if not successes:
             if error_count > 0:
                 error_dialog(self.gui, 'Generation Failed', 'All attempts failed. Check logs.', show=True)
             return
 
-        dlg = BatchReviewDialog(self.gui, review_map)
+        self.review_and_apply(successes)
+
+    def review_and_apply(self, successes):
+        """
+        :param successes: Dict { book_id: result entry from collect_results() }
+        Returns True if the review dialog was accepted.
+        """
+        from calibre_plugins.smart_summary_pro.interfaces.dialogs import BatchReviewDialog
+        db = self.gui.current_db
+        review_map = {}
+        for book_id, res in successes.items():
+            mi = db.get_metadata(book_id, index_is_id=True)
+            review_map[book_id] = {
+                'title': res['title'],
+                'content': res['content'],
+                'old_content': mi.comments,
+                'fields': res.get('fields', {})
+            }
+            review = res.get('review')
+            if review and review.get('old_source') == (mi.comments or ""):
+                review_map[book_id].update(review)
+
+        dlg = BatchReviewDialog(self.gui, review_map,
+                                export_handler=lambda decisions: self.export_results(successes, review_map, decisions))
         if dlg.exec_():
             applied_count = 0
             decisions = dlg.decisions
@@ -167,6 +468,119 @@ class SmartSummaryProAction(InterfaceAction):
                         mi = db.get_metadata(bid, index_is_id=True)
                         mi.comments = new_summary
                         db.set_metadata(bid, mi)
+                written = self.apply_extra_fields(db, {bid: review_map[bid]['fields'] for bid in val_map})
+                self.record_provenance(db, successes, val_map, written)
             
             self.gui.status_bar.showMessage(f"Updated summaries for {applied_count} books.", 3000)
             self.gui.library_view.model().refresh_ids(list(review_map.keys()))
+            return True
+        return False
+
+    def apply_extra_fields(self, db, fields_by_book):
+        """
+        One bulk set_field per extra field. Suggested tags are added to
+        existing tags. Returns {book_id: set of fields written}.
+        """
+        from calibre_plugins.smart_summary_pro.infrastructure.exchange import merge_tags
+        per_field = {}
+        for book_id, fields in fields_by_book.items():
+            for field, value in (fields or {}).items():
+                per_field.setdefault(field, {})[book_id] = value
+        api = db.new_api
+        written = {}
+        for field, val_map in per_field.items():
+            if field == 'tags':
+                val_map = merge_tags(api, val_map)
+            try:
+                api.set_field(field, val_map)
+            except Exception as e:
+                print(f"SmartSummary Pro: Failed to write {field}: {e}")
+                continue
+            for book_id in val_map:
+                written.setdefault(book_id, set()).add(field)
+        return written
+
+    def export_results(self, successes, review_map, decisions):
+        """Streams the reviewed results to a JSONL file for offline/team review."""
+        from calibre.gui2 import choose_save_file
+        from calibre_plugins.smart_summary_pro.infrastructure.exchange import export_rows
+        path = choose_save_file(self.gui, 'smart-summary-export', 'Export generated summaries',
+                                filters=[('JSON Lines', ['jsonl'])], initial_filename='summaries.jsonl')
+        if not path:
+            return
+        api = self.gui.current_db.new_api
+        
+        def rows():
+            for book_id, data in review_map.items():
+                res = successes[book_id]
+                yield {
+                    'book_id': book_id,
+                    'uuid': api.field_for('uuid', book_id),
+                    'title': data['title'],
+                    'old_summary': data['old_content'],
+                    'new_summary': data['content'],
+                    'model': res.get('model_name'),
+                    'tokens': res.get('tokens'),
+                    'elapsed': res.get('elapsed'),
+                    'decision': decisions.get(book_id, 'apply'),
+                    'fields': data.get('fields') or {},
+                }
+        try:
+            count = export_rows(path, rows())
+        except OSError as e:
+            error_dialog(self.gui, 'Export Failed', str(e), show=True)
+            return
+        self.gui.status_bar.showMessage(f"Exported {count} summaries to {path}", 5000)
+
+    def import_results(self):
+        """Applies the 'apply' decisions of a reviewed JSONL export in bulk."""
+        from calibre.gui2 import choose_files
+        from calibre_plugins.smart_summary_pro.infrastructure.exchange import iter_rows, apply_rows
+        paths = choose_files(self.gui, 'smart-summary-import', 'Import reviewed summaries',
+                             filters=[('JSON Lines', ['jsonl'])], select_only_single_file=True)
+        if not paths:
+            return
+        db = self.gui.current_db
+        try:
+            applied, skipped, skipped_fields = apply_rows(db, iter_rows(paths[0]))
+        except (OSError, UnicodeDecodeError) as e:
+            error_dialog(self.gui, 'Import Failed', str(e), show=True)
+            return
+        if applied:
+            self.gui.library_view.model().refresh_ids(applied)
+        message = f"Imported summaries: {len(applied)} applied, {skipped} skipped."
+        if skipped_fields:
+            message += " Fields not in this library: " + ", ".join(
+                f"{name} ({count})" for name, count in sorted(skipped_fields.items()))
+        self.gui.status_bar.showMessage(message, 8000)
+
+    def record_provenance(self, db, successes, val_map, written=None):
+        """
+        Remembers model, prompt and metadata versions of applied summaries.
+        :param written: {book_id: fields} the plugin itself just wrote (suggested
+                        tags); these are fingerprinted as written, so applying
+                        them does not make the summary look stale next time.
+        """
+        from calibre_plugins.smart_summary_pro.infrastructure.provenance import (
+            ProvenanceIndex, FINGERPRINT_FIELDS, metadata_fingerprint)
+        try:
+            api = db.new_api
+            records = {}
+            for book_id in val_map:
+                res = successes[book_id]
+                meta_fp = res.get('metadata_fp')
+                own = [f for f in (written or {}).get(book_id, ()) if f in FINGERPRINT_FIELDS]
+                if own and res.get('source_metadata') is not None:
+                    mi_dict = dict(res['source_metadata'])
+                    for field in own:
+                        mi_dict[field] = list(api.field_for(field, book_id) or ())
+                    meta_fp = metadata_fingerprint(mi_dict)
+                records[book_id] = {
+                    'model_id': res.get('model_id'),
+                    'model_name': res.get('model_name'),
+                    'prompt': res.get('prompt_fp'),
+                    'metadata': meta_fp,
+                }
+            ProvenanceIndex(db.library_id).record_many(records)
+        except Exception as e:
+            print(f"SmartSummary Pro: Failed to record provenance: {e}")
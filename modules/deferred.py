@@ -0,0 +1,97 @@
+"""
+@Input:  Book IDs that failed only on quota exhaustion, Library ID
+@Output: Persistent Deferred Queue, Resume Batches sized to free quota (in flight until settled)
+@Pos:    modules / deferred.py. Quota Deferral Queue.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import datetime
+import threading
+from calibre_plugins.smart_summary_pro.core.config import prefs
+from calibre_plugins.smart_summary_pro.core.quota import QuotaManager
+
+# Books handed to a running job, per library. Kept in memory only: after a
+# restart every queued book is pending again, so nothing is lost if Calibre
+# closes before the job ends.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+class DeferredQueue:
+    """
+    Books parked because every model was out of quota, kept in prefs per
+    library so they survive restarts. They are handed back once the daily
+    reset happens or a model's limit frees up, and leave the queue only when
+    their job has produced a result for them (complete()).
+    """
+    def __init__(self, library_id):
+        self.library_id = str(library_id)
+
+    def _all(self):
+        return prefs.get('deferred_queue', {})
+
+    def _in_flight(self):
+        return _in_flight.setdefault(self.library_id, set())
+
+    def book_ids(self):
+        return list(self._all().get(self.library_id, {}).get('book_ids', []))
+
+    def count(self):
+        return len(self.book_ids())
+
+    def add(self, book_ids):
+        if not book_ids:
+            return
+        with _in_flight_lock:
+            # Deferred again by the resumed job: pending once more.
+            self._in_flight().difference_update(book_ids)
+        queues = self._all()
+        entry = queues.setdefault(self.library_id, {'book_ids': [], 'since': None})
+        known = set(entry['book_ids'])
+        entry['book_ids'].extend(b for b in book_ids if b not in known)
+        entry['since'] = entry.get('since') or datetime.date.today().isoformat()
+        prefs['deferred_queue'] = queues
+
+    def take_ready(self, quota_mgr=None):
+        """
+        Returns the books that can run now: as many as today's remaining
+        quota allows (all of them if a model is unlimited). They stay in the
+        queue, marked in flight, until complete() or release().
+        """
+        with _in_flight_lock:
+            in_flight = self._in_flight()
+            pending = [b for b in self.book_ids() if b not in in_flight]
+        if not pending:
+            return []
+        quota_mgr = quota_mgr or QuotaManager()
+        quota_mgr.check_reset()
+        capacity = quota_mgr.total_remaining()
+        if capacity is not None:
+            if capacity <= 0:
+                return []
+            pending = pending[:capacity]
+        with _in_flight_lock:
+            self._in_flight().update(pending)
+        return pending
+
+    def release(self, book_ids):
+        """Puts in-flight books back to pending (their job failed or never started)."""
+        with _in_flight_lock:
+            self._in_flight().difference_update(book_ids)
+
+    def complete(self, book_ids):
+        """Removes books whose resumed job produced a result (success or hard failure)."""
+        done = set(book_ids)
+        with _in_flight_lock:
+            self._in_flight().difference_update(done)
+        queues = self._all()
+        entry = queues.get(self.library_id)
+        if not entry or not done.intersection(entry['book_ids']):
+            return
+        rest = [b for b in entry['book_ids'] if b not in done]
+        if rest:
+            entry['book_ids'] = rest
+        else:
+            queues.pop(self.library_id, None)
+        prefs['deferred_queue'] = queues
@@ -0,0 +1,90 @@
+"""
+@Input:  Generation Jobs (GenerationWorker) with a Priority
+@Output: Book-level Tasks executed on one shared, long-lived thread pool
+@Pos:    modules / engine.py. Global Scheduler.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import itertools
+import queue
+import threading
+from calibre_plugins.smart_summary_pro.infrastructure.api_manager import APIManager, ModelSlots
+
+# Lower value runs first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_BACKGROUND = 20
+
+
+class GenerationEngine:
+    """
+    One scheduler for every generation job of the session. Books of all jobs
+    share a single priority queue and worker pool, so an interactive
+    single-book request jumps ahead of a running batch, per-model concurrency
+    limits hold across jobs, and router stats, key pools and model slots
+    stay warm between jobs. Each job talks to the APIs through its own
+    APIManager, bound to the settings snapshot it was started with.
+    """
+    def __init__(self):
+        self.slots = ModelSlots()
+        self.max_workers = 1
+        self.queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._active = 0
+        self.jobs = []
+
+    def submit(self, job, priority=PRIORITY_BATCH):
+        job.api_manager = APIManager(job.config, self.slots)
+        job.priority = priority
+        if not job.book_ids:
+            job.book_done(None)
+            return job
+        job.start_excerpts()
+        with self._lock:
+            self.jobs.append(job)
+            # The pool only grows; the newest job's setting applies.
+            self.max_workers = max(self.max_workers, job.config.max_workers)
+        for book_id in job.book_ids:
+            self.queue.put((priority, next(self._seq), job, book_id))
+        self._ensure_threads()
+        return job
+
+    def _ensure_threads(self):
+        # Local servers that reported more slots than max_workers get enough
+        # threads to fill them. Only cached probes count, so this never blocks.
+        wanted = max(self.max_workers, self.slots.local_capacity())
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < wanted:
+                t = threading.Thread(target=self._run, name="SmartSummaryEngine", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def _run(self):
+        while True:
+            _, _, job, book_id = self.queue.get()
+            with self._lock:
+                self._active += 1
+            try:
+                if not job.was_aborted:
+                    job.process_book(book_id)
+            except Exception as e:
+                job.results[book_id] = {'success': False, 'error': str(e),
+                                        'title': job.metadata_map.get(book_id, {}).get('title', 'Unknown')}
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    if job.book_done(book_id):
+                        self.jobs.remove(job)
+                self.queue.task_done()
+            self._ensure_threads()
+
+    def is_idle(self):
+        with self._lock:
+            return self._active == 0 and self.queue.empty()
+
+    def pending_count(self):
+        return self.queue.qsize()
@@ -0,0 +1,205 @@
+"""
+@Input:  System Prompt, User Prompt Template, Book Metadata, Model Context Window
+@Output: Validated, Budgeted (system, user) Prompt Pair per Model, Parsed Structured Output
+@Pos:    modules / prompt.py. Prompt Compilation Stage.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import json
+import re
+import string
+
+# Variables a user prompt template may reference.
+PROMPT_FIELDS = ('title', 'authors', 'publisher', 'pubdate', 'series', 'series_index',
+                 'tags', 'comments', 'languages', 'excerpt')
+
+# Long fields that may be cut to fit the budget, trimmed in this order.
+TRUNCATABLE_FIELDS = ('excerpt', 'comments', 'tags')
+
+FIELD_DEFAULTS = {'series': "None", 'tags': "None", 'comments': "None", 'excerpt': "None"}
+
+DEFAULT_CONTEXT_WINDOW = 16384
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+
+
+class PromptTemplateError(Exception):
+    """Raised at compile time, before any request is sent."""
+    pass
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate: ~4 ASCII chars per token, one token per other char
+    (CJK titles and excerpts are common in this library).
+    """
+    ascii_count = sum(1 for c in text if ord(c) < 128)
+    return ascii_count // 4 + (len(text) - ascii_count) + 1
+
+
+def _clip(text, tokens):
+    """Cuts text to roughly the given number of tokens."""
+    if tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + " ..."
+
+
+def _normalize(field, value):
+    if value is None or value == "" or value == []:
+        return FIELD_DEFAULTS.get(field, "Unknown")
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v) for v in value)
+    if field == 'comments':
+        value = _WS_RE.sub(' ', _TAG_RE.sub(' ', str(value))).strip()
+    return str(value) or FIELD_DEFAULTS.get(field, "Unknown")
+
+
+def _describe(spec):
+    if spec.get('multiple'):
+        return "a JSON list of short strings"
+    datatype = spec.get('datatype')
+    if datatype == 'bool':
+        return "true or false"
+    if datatype in ('int', 'float', 'rating'):
+        return "a number"
+    return "a single line of text"
+
+
+def output_instruction(output_fields):
+    """
+    Appended to the user prompt when extra fields are requested, so one
+    request returns the summary and every field as a JSON object.
+    """
+    if not output_fields:
+        return ""
+    lines = ["", "", "# Output Format",
+             "Return only a JSON object, without code fences, with these keys:",
+             '- "summary": the full book introduction described above']
+    for spec in output_fields:
+        lines.append(f'- "{spec["field"]}": {spec.get("label", spec["field"])}, as {_describe(spec)}')
+    return "\n".join(lines)
+
+
+def parse_structured(content, output_fields):
+    """
+    Splits a structured response into (summary, {field: value}).
+    Falls back to treating the whole response as the summary.
+    """
+    if not output_fields:
+        return content, {}
+    text = content.strip()
+    start, end = text.find('{'), text.rfind('}')
+    try:
+        data = json.loads(text[start:end + 1]) if start != -1 and end > start else None
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict) or not data.get('summary'):
+        return content, {}
+    values = {}
+    for spec in output_fields:
+        value = data.get(spec['field'])
+        if value in (None, "", []):
+            continue
+        if spec.get('multiple') and not isinstance(value, list):
+            value = [v.strip() for v in str(value).split(',') if v.strip()]
+        elif not spec.get('multiple') and isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        values[spec['field']] = value
+    return str(data['summary']), values
+
+
+class CompiledPrompt:
+    """
+    A prompt template validated once per job. Unknown variables, malformed
+    braces, conversions, attribute/index access and format specs that cannot
+    apply to text raise PromptTemplateError up front instead of failing every book.
+    """
+    def __init__(self, system_prompt, user_prompt, max_tokens=4096, output_fields=()):
+        self.system_prompt = system_prompt or ""
+        self.user_prompt = user_prompt or ""
+        self.max_tokens = max_tokens
+        # Only the user prompt is a template; the system prompt is sent verbatim.
+        self.fields = self._parse(self.user_prompt)
+        # Extra metadata requested in the same round-trip (see output_instruction()).
+        self.output_fields = list(output_fields)
+        self.output_instruction = output_instruction(self.output_fields)
+
+    def _parse(self, template):
+        fields = set()
+        try:
+            for _, name, _, conversion in string.Formatter().parse(template):
+                if name is None:
+                    continue
+                if not name:
+                    raise PromptTemplateError("Positional '{}' placeholders are not supported; use named variables.")
+                if not name.isidentifier():
+                    raise PromptTemplateError(
+                        f"'{{{name}}}': attribute and index access are not supported; use the plain variable.")
+                if conversion is not None:
+                    raise PromptTemplateError(f"'{{{name}!{conversion}}}': conversions are not supported.")
+                fields.add(name)
+        except ValueError as e:
+            raise PromptTemplateError(f"Malformed template: {e}. Use '{{{{' and '}}}}' for literal braces.")
+        unknown = sorted(fields - set(PROMPT_FIELDS))
+        if unknown:
+            raise PromptTemplateError(
+                "Unknown template variable(s): " + ", ".join("{%s}" % f for f in unknown) +
+                "\nAvailable: " + ", ".join("{%s}" % f for f in PROMPT_FIELDS))
+        # Every bound value is a string, so a trial render with placeholder
+        # strings catches format specs that would fail on every book ({pubdate:%Y}).
+        try:
+            template.format(**{f: FIELD_DEFAULTS.get(f, "Unknown") for f in PROMPT_FIELDS})
+        except (ValueError, AttributeError, IndexError, KeyError) as e:
+            raise PromptTemplateError(f"Template cannot be rendered: {e}")
+        return fields
+
+    def bind(self, mi_dict):
+        values = {f: _normalize(f, mi_dict.get(f)) for f in PROMPT_FIELDS}
+        return BoundPrompt(self, values)
+
+
+class BoundPrompt:
+    """One book's prompt; rendered per model to fit that model's context window."""
+    def __init__(self, compiled, values):
+        self.compiled = compiled
+        self.values = values
+        self._rendered = {}
+
+    def for_model(self, model_conf):
+        window = model_conf.get('context_window') or DEFAULT_CONTEXT_WINDOW
+        budget = window - self.compiled.max_tokens
+        if budget not in self._rendered:
+            self._rendered[budget] = self.render(budget)
+        return self._rendered[budget]
+
+    def render(self, budget=None):
+        values = dict(self.values)
+        if budget is not None:
+            used = [f for f in TRUNCATABLE_FIELDS if f in self.compiled.fields]
+            skeleton = dict(values, **{f: "" for f in used})
+            fixed = estimate_tokens(self.compiled.system_prompt) + \
+                estimate_tokens(self.compiled.user_prompt.format(**skeleton)) + \
+                estimate_tokens(self.compiled.output_instruction)
+            available = budget - fixed
+            total = sum(estimate_tokens(values[f]) for f in used)
+            # Trim the least essential fields first until the rest fits.
+            for f in used:
+                if total <= available:
+                    break
+                size = estimate_tokens(values[f])
+                keep = max(0, size - (total - available))
+                values[f] = _clip(values[f], keep)
+                total -= size - estimate_tokens(values[f])
+        user = self.compiled.user_prompt.format(**values) + self.compiled.output_instruction
+        return (self.compiled.system_prompt, user)
@@ -0,0 +1,203 @@
+"""
+@Input:  Raw Model Output (Markdown, occasionally HTML, chatty preambles)
+@Output: Calibre-safe Comments HTML
+@Pos:    modules / render.py. Rendering & Sanitizing Stage (runs in workers).
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import html
+import re
+from html.parser import HTMLParser
+
+try:
+    import markdown as _markdown  # Bundled with calibre
+except ImportError:
+    _markdown = None
+
+# --- Preamble / boilerplate ---------------------------------------------------
+
+_FENCE_RE = re.compile(r'^\s*```[\w-]*\s*\n(.*?)\n\s*```\s*$', re.S)
+_INTERJECTION = r'(?:sure|certainly|of course|okay|ok|absolutely|好的|当然)'
+# "Sure!" alone on its line.
+_INTERJECTION_RE = re.compile(_INTERJECTION + r'\s*[,!.，！。]?', re.I)
+# A short line that only introduces what follows: "Sure, here is the introduction:".
+_LEAD_IN_RE = re.compile(
+    r'(?:' + _INTERJECTION + r'\b|(?:here\s+is|here\s+are|here\'s|below\s+is)\b|以下是|下面是).*[:：]', re.I)
+LEAD_IN_MAX_CHARS = 80
+# Only unmistakable offers of more help; a real closing paragraph ("If you
+# want to understand ...", "希望读者...") must survive.
+_CLOSING_RE = re.compile(
+    r'^\s*(i hope this helps|hope this helps|let me know|feel free to|would you like me to|'
+    r'如需(修改|调整|进一步)|希望(以上|这)[^。！!\n]{0,12}帮助)', re.I)
+_RULE_RE = re.compile(r'^\s*([-*_]\s*){3,}$')
+
+
+def _is_lead_in(line):
+    # Never a sentence of the summary itself ("Certainly, few novels of ...").
+    line = line.strip()
+    if _INTERJECTION_RE.fullmatch(line):
+        return True
+    return len(line) <= LEAD_IN_MAX_CHARS and bool(_LEAD_IN_RE.fullmatch(line))
+
+
+def strip_preamble(text):
+    """
+    Removes what models wrap around the answer: a code fence around the
+    whole reply, a leading "Sure, here is..." line and a closing offer of
+    further help. The answer itself is left alone.
+    """
+    text = (text or "").strip()
+    fenced = _FENCE_RE.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    paragraphs = re.split(r'\n\s*\n', text)
+    lines = paragraphs[0].split('\n')
+    if len(paragraphs) > 1 or len(lines) > 1:
+        if _is_lead_in(lines[0]):
+            lines = lines[1:]
+            paragraphs[0] = '\n'.join(lines)
+    if len(paragraphs) > 1 and len(paragraphs[-1]) < 300 and _CLOSING_RE.match(paragraphs[-1]):
+        paragraphs = paragraphs[:-1]
+    paragraphs = [p for p in paragraphs if p.strip()]
+    # A separator line left behind by the preamble.
+    while paragraphs and _RULE_RE.match(paragraphs[0]):
+        paragraphs.pop(0)
+    return '\n\n'.join(paragraphs).strip()
+
+# --- Markdown ------------------------------------------------------------------
+
+_HTML_START_RE = re.compile(r'^\s*<(p|div|h[1-6]|ul|ol|blockquote|table|br|b|strong|i|em)\b', re.I)
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_ULIST_RE = re.compile(r'^\s*[-*+]\s+(.*)$')
+_OLIST_RE = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+_INLINE = (
+    (re.compile(r'`([^`]+)`'), r'<code>\1</code>'),
+    (re.compile(r'\*\*(.+?)\*\*|__(.+?)__'), lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>"),
+    (re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])'), r'<em>\1</em>'),
+    (re.compile(r'\[([^\]]+)\]\((https?://[^)\s]+)\)'), r'<a href="\2">\1</a>'),
+)
+
+
+def _inline(text):
+    text = html.escape(text, quote=False)
+    for pattern, repl in _INLINE:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def _simple_markdown(text):
+    """Small fallback for the Markdown models actually emit, if the library is missing."""
+    out = []
+    for block in re.split(r'\n\s*\n', text):
+        lines = [l for l in block.split('\n') if l.strip()]
+        if not lines:
+            continue
+        heading = _HEADING_RE.match(lines[0])
+        if heading and len(lines) == 1:
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif all(_ULIST_RE.match(l) or _OLIST_RE.match(l) or l.startswith((' ', '\t')) for l in lines) \
+                and (_ULIST_RE.match(lines[0]) or _OLIST_RE.match(lines[0])):
+            tag = 'ol' if _OLIST_RE.match(lines[0]) and not _ULIST_RE.match(lines[0]) else 'ul'
+            items = []
+            for l in lines:
+                item = _ULIST_RE.match(l) or _OLIST_RE.match(l)
+                if item:
+                    items.append(item.group(1))
+                elif items:
+                    items[-1] += ' ' + l.strip()
+            out.append(f"<{tag}>" + ''.join(f"<li>{_inline(i)}</li>" for i in items) + f"</{tag}>")
+        elif all(l.lstrip().startswith('>') for l in lines):
+            quoted = '<br>'.join(_inline(l.lstrip()[1:].strip()) for l in lines)
+            out.append(f"<blockquote><p>{quoted}</p></blockquote>")
+        elif len(lines) == 1 and _RULE_RE.match(lines[0]):
+            out.append("<hr>")
+        else:
+            # Heading line directly followed by text, no blank line between.
+            if heading:
+                level = len(heading.group(1))
+                out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+                lines = lines[1:]
+            out.append("<p>" + '<br>'.join(_inline(l.strip()) for l in lines) + "</p>")
+    return '\n'.join(out)
+
+
+def markdown_to_html(text):
+    if _HTML_START_RE.match(text):
+        # Some models answer in HTML already; it is only sanitized.
+        return text
+    if _markdown is not None:
+        try:
+            return _markdown.markdown(text, extensions=['sane_lists'])
+        except Exception as e:
+            print(f"[SmartSummary] Markdown library failed, using fallback: {e}")
+    return _simple_markdown(text)
+
+# --- Sanitizing ----------------------------------------------------------------
+
+ALLOWED_TAGS = frozenset((
+    'p', 'br', 'hr', 'b', 'strong', 'i', 'em', 'u', 's', 'sub', 'sup', 'code', 'pre',
+    'ul', 'ol', 'li', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'a', 'span', 'div'))
+_VOID_TAGS = frozenset(('br', 'hr'))
+# Dropped together with everything inside them.
+_DROP_CONTENT = frozenset(('script', 'style', 'iframe', 'object', 'embed', 'head', 'title', 'svg', 'math'))
+_SAFE_HREF_RE = re.compile(r'^(https?:|mailto:)', re.I)
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _DROP_CONTENT:
+            self.skip += 1
+            return
+        if self.skip or tag not in ALLOWED_TAGS:
+            return
+        kept = ''
+        if tag == 'a':
+            href = dict(attrs).get('href') or ''
+            if _SAFE_HREF_RE.match(href.strip()):
+                kept = f' href="{html.escape(href.strip())}"'
+        self.out.append(f"<{tag}{kept}>")
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.skip and tag in _VOID_TAGS:
+            self.out.append(f"<{tag}>")
+
+    def handle_endtag(self, tag):
+        if tag in _DROP_CONTENT:
+            self.skip = max(0, self.skip - 1)
+            return
+        if not self.skip and tag in ALLOWED_TAGS and tag not in _VOID_TAGS:
+            self.out.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.out.append(html.escape(data, quote=False))
+
+
+def sanitize_html(markup):
+    """
+    Keeps only simple formatting tags (no scripts, styles, event handlers
+    or foreign attributes), then lets calibre apply its own comments
+    cleanup when it is available.
+    """
+    parser = _Sanitizer()
+    parser.feed(markup or "")
+    parser.close()
+    clean = ''.join(parser.out).strip()
+    try:
+        from calibre.library.comments import sanitize_comments_html
+        clean = sanitize_comments_html(clean)
+    except Exception:
+        pass
+    return clean
+
+
+def render_summary(text):
+    """Model output -> HTML ready for setHtml and the comments field."""
+    return sanitize_html(markdown_to_html(strip_preamble(text)))
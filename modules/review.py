@@ -0,0 +1,64 @@
+"""
+@Input:  Existing Summary (HTML), Generated Summary
+@Output: Word-level Diff, Similarity Score, Pre-rendered Review HTML
+@Pos:    modules / review.py. Review Preparation Stage (runs in workers).
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import difflib
+import html
+import re
+
+_BREAK_RE = re.compile(r'<\s*(br|/p|/div|/li|/h[1-6])\b[^>]*>', re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+# CJK characters are diffed one by one, everything else word by word.
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_RE = re.compile(r'\s+|[%s]|[^\s%s]+' % (_CJK, _CJK))
+
+_DEL_STYLE = 'background-color:#ffcdd2; text-decoration:line-through;'
+_INS_STYLE = 'background-color:#c8e6c9;'
+_EMPTY_HTML = "<i>No existing summary.</i>"
+
+
+def html_to_text(markup):
+    if not markup:
+        return ""
+    text = _TAG_RE.sub('', _BREAK_RE.sub('\n', markup))
+    return re.sub(r'\n\s*\n+', '\n\n', html.unescape(text)).strip()
+
+
+def _render(tokens, style=None):
+    out = html.escape(''.join(tokens)).replace('\n', '<br>')
+    if style and out.strip():
+        return f'<span style="{style}">{out}</span>'
+    return out
+
+
+def prepare_review(old_markup, new_markup):
+    """
+    Diffs the current and generated summaries word by word.
+    Returns {'similarity', 'old_html', 'new_html', 'old_source'}; the HTML is
+    ready for setHtml so the review dialog does no work while navigating.
+    """
+    old_tokens = _TOKEN_RE.findall(html_to_text(old_markup))
+    new_tokens = _TOKEN_RE.findall(html_to_text(new_markup))
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    old_parts, new_parts = [], []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == 'equal':
+            old_parts.append(_render(old_tokens[i1:i2]))
+            new_parts.append(_render(new_tokens[j1:j2]))
+            continue
+        if i2 > i1:
+            old_parts.append(_render(old_tokens[i1:i2], _DEL_STYLE))
+        if j2 > j1:
+            new_parts.append(_render(new_tokens[j1:j2], _INS_STYLE))
+    similarity = matcher.ratio() if old_tokens or new_tokens else 1.0
+    return {
+        'similarity': similarity,
+        'old_html': ''.join(old_parts) if old_tokens else _EMPTY_HTML,
+        'new_html': ''.join(new_parts),
+        # Lets the dialog detect comments edited after the diff was made.
+        'old_source': old_markup or "",
+    }
@@ -0,0 +1,75 @@
+"""
+@Input:  Calibre Library (new book ids / saved search), Engine Idle State, Quota
+@Output: Small Throttled Batches of Book IDs for background generation
+@Pos:    modules / watcher.py. Background Auto-generation Policy.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+from calibre_plugins.smart_summary_pro.core.config import prefs
+from calibre_plugins.smart_summary_pro.core.quota import QuotaManager
+from calibre_plugins.smart_summary_pro.modules.deferred import DeferredQueue
+
+
+class AutoGenerationWatcher:
+    """
+    Opt-in watcher that picks up books added after it was enabled, or books
+    matching a search (e.g. "comments:false"), and releases them a few at a
+    time, only while the engine is idle and quota is left. Each book is
+    offered once per session so failures do not loop.
+    """
+    def __init__(self):
+        self.quota_mgr = QuotaManager()
+        self.offered = set()
+
+    def _watermarks(self):
+        return prefs.get('auto_generate_watermark', {})
+
+    def candidates(self, db):
+        api = db.new_api
+        library_id = str(db.library_id)
+        search = (prefs.get('auto_generate_search', '') or '').strip()
+        if search:
+            ids = set(api.search(search))
+        else:
+            all_ids = api.all_book_ids()
+            marks = self._watermarks()
+            if library_id not in marks:
+                # First run: start watching from now, do not backfill the library.
+                marks[library_id] = max(all_ids) if all_ids else 0
+                prefs['auto_generate_watermark'] = marks
+                return []
+            mark = marks[library_id]
+            ids = {bid for bid in all_ids if bid > mark}
+        ids -= self.offered
+        ids -= set(DeferredQueue(library_id).book_ids())
+        return sorted(ids)
+
+    def next_batch(self, db, engine):
+        """
+        Returns the next book ids to queue, or [] if now is not a good time.
+        Nothing is marked as offered until mark_submitted() confirms the job
+        was accepted, so a batch that could not start is offered again.
+        """
+        if not prefs.get('auto_generate_enabled', False) or not prefs.get('api_configs'):
+            return []
+        if not engine.is_idle():
+            return []
+        batch_size = max(1, prefs.get('auto_generate_batch', 5))
+        capacity = self.quota_mgr.total_remaining()
+        if capacity is not None:
+            batch_size = min(batch_size, capacity)
+            if batch_size <= 0:
+                return []
+        return self.candidates(db)[:batch_size]
+
+    def mark_submitted(self, db, batch):
+        """Advances the watermark past a batch the engine has accepted."""
+        if not batch:
+            return
+        self.offered.update(batch)
+        marks = self._watermarks()
+        library_id = str(db.library_id)
+        if library_id in marks:
+            marks[library_id] = max(marks[library_id], max(batch))
+            prefs['auto_generate_watermark'] = marks
@@ -1,60 +1,162 @@
 """
-@Input:  Book IDs, Prompts
-@Output: Summaries Result Map
+@Input:  Book IDs, RunConfig Snapshot (prompts, limits), Optional Format Paths (excerpt stage)
+@Output: Summaries Result Map (rendered, sanitized HTML)
 @Pos:    modules / worker.py. Domain Logic Engine.
 
 !!! Maintenance Protocol: If logic, dependencies, or output change, 
 !!! update this header AND the parent directory's _DIR_META.md.
 """
-from calibre_plugins.smart_summary_pro.infrastructure.api_manager import APIManager
+from calibre_plugins.smart_summary_pro.infrastructure.api_manager import (
+    APIManager, QuotaExhaustedError, Deadline, DeadlineExceeded)
+from calibre_plugins.smart_summary_pro.infrastructure.excerpt import ExcerptExtractor
+from calibre_plugins.smart_summary_pro.modules.prompt import CompiledPrompt, parse_structured
+from calibre_plugins.smart_summary_pro.modules.render import render_summary
+from calibre_plugins.smart_summary_pro.modules.review import prepare_review
 import concurrent.futures
+import threading
+import time
 
 class GenerationWorker:
     """
     Background worker for generating book summaries.
-    Compatible with Calibre 8.x job_manager.run_threaded_job() API.
+    Normally submitted to the shared GenerationEngine, which calls
+    process_book()/book_done() per book; calling the worker directly runs
+    it standalone on its own small pool.
     """
-    def __init__(self, book_ids, metadata_map, system_prompt, user_prompt):
+    def __init__(self, book_ids, metadata_map, config, output_fields=()):
         self.book_ids = book_ids
         self.metadata_map = metadata_map
-        self.system_prompt = system_prompt
-        self.user_prompt = user_prompt
-        self.api_manager = APIManager()
+        # RunConfig snapshot: the whole job uses the settings it started with.
+        self.config = config
+        self.system_prompt = config.system_prompt
+        self.user_prompt = config.user_prompt
+        # Validated once per job; raises PromptTemplateError before any request.
+        self.prompt = CompiledPrompt(config.system_prompt, config.user_prompt, config.max_tokens, output_fields)
+        self.excerpt_kb = config.excerpt_kb
+        # Time budgets in seconds (None = unbounded). The job budget starts now.
+        self.book_deadline = config.book_deadline
+        self.job_deadline = Deadline(config.job_deadline)
+        self.excerpt_futures = {}
+        self.extractor = None
+        self.api_manager = None  # Set by the engine (shared slots) or on standalone run
+        self.priority = None
         
         self.results = {}
         self.failed = False
         self.was_aborted = False
         self.completed_count = 0
         self.total_count = len(book_ids)
+        self._remaining = len(book_ids)
+        self._done_lock = threading.Lock()
+        self.done_event = threading.Event()
         
     def __call__(self):
+        if self.api_manager is None:
+            self.api_manager = APIManager(self.config)
+        self.start_excerpts()
         try:
             with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
                 futures = {executor.submit(self.process_book, book_id): book_id for book_id in self.book_ids}
                 for future in concurrent.futures.as_completed(futures):
-                    if self.was_aborted:
-                        continue
-                    self.completed_count += 1
+                    self.book_done(futures[future])
         except Exception as e:
             self.failed = True
             self.results['fatal_error'] = str(e)
+        finally:
+            self.finish()
+
+    def book_done(self, book_id):
+        """Counts a finished book; returns True once the whole job is done."""
+        with self._done_lock:
+            if book_id is not None:
+                self.completed_count += 1
+                self._remaining -= 1
+            if self._remaining > 0 or self.done_event.is_set():
+                return False
+        self.finish()
+        return True
+
+    def finish(self):
+        if self.extractor is not None:
+            self.extractor.shutdown()
+            self.extractor = None
+        self.done_event.set()
+
+    def is_finished(self):
+        return self.done_event.is_set()
+
+    def start_excerpts(self):
+        """
+        Queues excerpt extraction for every book up front, so file reads run
+        ahead of (and hidden behind) the API calls.
+        """
+        if not self.excerpt_kb or 'excerpt' not in self.prompt.fields or self.extractor is not None:
+            return
+        self.extractor = ExcerptExtractor(self.excerpt_kb * 1024)
+        for book_id in self.book_ids:
+            path = self.metadata_map.get(book_id, {}).get('format_path')
+            if path:
+                self.excerpt_futures[book_id] = self.extractor.submit(path)
 
     def process_book(self, book_id):
         if getattr(self, 'was_aborted', False):
             return
             
-        mi_dict = self.metadata_map.get(book_id, {})
+        mi_dict = dict(self.metadata_map.get(book_id, {}))
         title = mi_dict.get('title', 'Unknown')
         
+        if self.job_deadline.expired():
+            self.results[book_id] = {
+                'success': False,
+                'deadline_exceeded': True,
+                'error': "Job deadline exceeded before this book started.",
+                'title': title
+            }
+            return
+        deadline = Deadline(self.book_deadline, parent=self.job_deadline)
+        
+        future = self.excerpt_futures.get(book_id)
+        mi_dict['excerpt'] = future.result() if future is not None else ''
+        
         try:
-            formatted_system = self.system_prompt
-            formatted_user = self.user_prompt.format(**mi_dict)
-            prompt = (formatted_system, formatted_user)
+            # Rendered per model by the API layer to fit its context window.
+            prompt = self.prompt.bind(mi_dict)
+            # Rendered once here as well, so a template problem fails this book
+            # and is never counted against a model's error rate.
+            prompt.render()
             
-            summary = self.api_manager.generate_summary(prompt)
+            started = time.monotonic()
+            content, model, usage = self.api_manager.generate(prompt, deadline)
+            # One round-trip may carry extra fields (tags, custom columns) as JSON.
+            summary, fields = parse_structured(content, self.prompt.output_fields)
+            # Markdown -> sanitized comments HTML, once, here in the pool; the
+            # review dialog and the apply step use it as is.
+            summary = render_summary(summary)
             self.results[book_id] = {
                 'success': True, 
                 'content': summary, 
+                'fields': fields,
+                'title': title,
+                'model_id': model.get('id'),
+                'model_name': model.get('model_name'),
+                'tokens': usage.get('total_tokens'),
+                'elapsed': round(time.monotonic() - started, 2),
+                # Diff and review HTML are prepared here, off the GUI thread.
+                'review': prepare_review(mi_dict.get('comments'), summary)
+            }
+        except DeadlineExceeded as e:
+            self.results[book_id] = {
+                'success': False, 
+                'deadline_exceeded': True,
+                'error': str(e), 
+                'title': title
+            }
+        except QuotaExhaustedError as e:
+            # Parked in the deferred queue and retried once quota frees up.
+            self.results[book_id] = {
+                'success': False, 
+                'deferred': True,
+                'error': str(e), 
                 'title': title
             }
         except KeyError as e:
@@ -0,0 +1,94 @@
+"""
+@Input:  Nothing (tests run without Calibre or Qt installed)
+@Output: Minimal stand-ins for the calibre / qt modules the plugin imports
+@Pos:    tests / _stubs.py. Test Harness.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import importlib.util
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'calibre_plugins.smart_summary_pro'
+
+
+class Dummy:
+    """Accepts any call or attribute access, like a Qt object nobody looks at."""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return Dummy()
+
+    def __getattr__(self, name):
+        return Dummy()
+
+
+class JSONConfig(dict):
+    """In-memory calibre JSONConfig: defaults are returned but never stored."""
+    def __init__(self, name):
+        super().__init__()
+        self.defaults = {}
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return self.defaults.get(key, default)
+
+
+class InterfaceAction:
+    def __init__(self, gui=None):
+        self.gui = gui or Dummy()
+        self.qaction = Dummy()
+        self.genesis()
+
+    def create_menu_action(self, menu, unique_name, text, triggered=None, **kwargs):
+        return Dummy()
+
+
+class QTimer:
+    scheduled = []
+
+    @classmethod
+    def singleShot(cls, msec, callback):
+        cls.scheduled.append((msec, callback))
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """
+    Registers the stand-ins and maps the plugin package to the source tree,
+    as calibre's plugin loader would. Returns the plugin package module.
+    """
+    _module('calibre', __path__=[])
+    _module('calibre.customize', InterfaceActionBase=object)
+    _module('calibre.gui2', __path__=[], error_dialog=Dummy(), choose_files=Dummy(),
+            choose_save_file=Dummy())
+    _module('calibre.gui2.actions', InterfaceAction=InterfaceAction)
+    _module('calibre.utils', __path__=[])
+    _module('calibre.utils.config', JSONConfig=JSONConfig)
+    _module('qt', __path__=[])
+    _module('qt.core', QMenu=Dummy, QTimer=QTimer)
+    _module('calibre_plugins', __path__=[])
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, os.path.join(ROOT, '__init__.py'), submodule_search_locations=[ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def ensure_installed():
+    """install() once per process, for tests that import the plugin directly."""
+    if PACKAGE in sys.modules:
+        return sys.modules[PACKAGE]
+    return install()
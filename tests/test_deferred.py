@@ -0,0 +1,69 @@
+"""
+@Input:  Deferred Queue with a fixed-capacity quota stand-in
+@Output: Checks that resumed books stay queued until their result exists
+@Pos:    tests / test_deferred.py. Quota Deferral Queue Test.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _stubs
+
+_stubs.ensure_installed()
+
+from calibre_plugins.smart_summary_pro.core.config import prefs
+from calibre_plugins.smart_summary_pro.modules import deferred
+from calibre_plugins.smart_summary_pro.modules.deferred import DeferredQueue
+
+
+class FixedQuota:
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+
+    def check_reset(self):
+        pass
+
+    def total_remaining(self):
+        return self.capacity
+
+
+@pytest.fixture
+def queue():
+    prefs.pop('deferred_queue', None)
+    deferred._in_flight.clear()
+    queue = DeferredQueue('lib')
+    queue.add([1, 2, 3])
+    return queue
+
+
+def test_taken_books_stay_queued_until_complete(queue):
+    assert queue.take_ready(FixedQuota(2)) == [1, 2]
+    assert queue.book_ids() == [1, 2, 3]
+    # Already in flight: not handed out twice.
+    assert queue.take_ready(FixedQuota()) == [3]
+    queue.complete([1])
+    assert queue.book_ids() == [2, 3]
+
+
+def test_restart_or_failure_makes_books_pending_again(queue):
+    queue.take_ready(FixedQuota())
+    queue.release([1, 2])
+    assert queue.take_ready(FixedQuota()) == [1, 2]
+    # A restart forgets what was in flight; the queue itself is intact.
+    deferred._in_flight.clear()
+    assert queue.take_ready(FixedQuota()) == [1, 2, 3]
+
+
+def test_deferred_again_is_pending(queue):
+    queue.take_ready(FixedQuota())
+    queue.add([2])
+    queue.complete([1, 3])
+    assert queue.book_ids() == [2]
+    assert queue.take_ready(FixedQuota()) == [2]
+    queue.complete([2])
+    assert 'lib' not in prefs.get('deferred_queue', {})
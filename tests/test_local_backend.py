@@ -0,0 +1,154 @@
+"""
+@Input:  In-process stand-in for a local llama.cpp-style server
+@Output: Checks for the Local provider (slots, auth, retries, quota)
+@Pos:    tests / test_local_backend.py. Local Inference Test.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _stubs
+
+_stubs.ensure_installed()
+
+from calibre_plugins.smart_summary_pro.core.config import RunConfig
+from calibre_plugins.smart_summary_pro.infrastructure.api_manager import APIManager, ModelSlots
+from calibre_plugins.smart_summary_pro.modules.engine import GenerationEngine
+from calibre_plugins.smart_summary_pro.modules.worker import GenerationWorker
+
+TOTAL_SLOTS = 4
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Answers /props and the chat endpoint; statuses in 'plan' are served first."""
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.delay = delay
+        self.plan = []
+        self.chat_requests = 0
+        self.auth_headers = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/props':
+            self._reply(200, {'total_slots': TOTAL_SLOTS})
+        else:
+            self._reply(404, {})
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.chat_requests += 1
+            server.auth_headers.append(self.headers.get('Authorization'))
+            status = server.plan.pop(0) if server.plan else 200
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            if status != 200:
+                self._reply(status, {'error': 'busy'})
+                return
+            time.sleep(server.delay)
+            self._reply(200, {'choices': [{'message': {'content': 'A summary.'}}],
+                              'usage': {'total_tokens': 7}})
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@pytest.fixture
+def server():
+    srv = StandInServer()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def local_config(endpoint, **settings):
+    model = {'id': 'local-' + endpoint, 'name': 'Local test', 'provider': 'Local',
+             'endpoint': endpoint, 'model_name': 'stand-in', 'api_keys': [],
+             'daily_limit': 1, 'max_concurrency': 1}
+    source = {'api_configs': [model], 'max_workers': 1, 'book_deadline': 30,
+              'system_prompt': 'You summarize books.', 'user_prompt': 'Summarize {title}.'}
+    source.update(settings)
+    return RunConfig(source)
+
+
+def test_concurrency_follows_reported_slots(server):
+    config = local_config(server.endpoint)
+    slots = ModelSlots()
+    # max_concurrency is 1, but the server says it decodes 4 in parallel.
+    assert slots.limit_for(config.models[0]) == TOTAL_SLOTS
+    assert slots.local_capacity() == TOTAL_SLOTS
+
+
+def test_engine_keeps_all_slots_busy(server):
+    server.delay = 0.3
+    config = local_config(server.endpoint)
+    book_ids = list(range(1, 13))
+    job = GenerationWorker(book_ids, {bid: {'title': f'Book {bid}'} for bid in book_ids}, config)
+    GenerationEngine().submit(job)
+    assert job.done_event.wait(30)
+    assert all(job.results[bid]['success'] for bid in book_ids)
+    # max_workers is 1: the extra threads come from the probed slot count.
+    assert server.peak == TOTAL_SLOTS
+
+
+def test_keyless_request_sends_no_authorization(server):
+    content, model, usage = APIManager(local_config(server.endpoint)).generate("Hello")
+    assert content == 'A summary.'
+    assert server.auth_headers == [None]
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_busy_server_is_retried_quickly(server, status):
+    server.plan = [status]
+    started = time.monotonic()
+    content, _, _ = APIManager(local_config(server.endpoint)).generate("Hello")
+    elapsed = time.monotonic() - started
+    assert content == 'A summary.'
+    assert server.chat_requests == 2
+    # Cloud models back off at least one second here.
+    assert elapsed < 0.9
+
+
+def test_local_models_are_never_deferred(server):
+    manager = APIManager(local_config(server.endpoint))
+    model_id = manager.config.models[0]['id']
+    # daily_limit is 1; a local model ignores it.
+    for _ in range(3):
+        assert manager.generate("Hello")[0] == 'A summary.'
+    assert manager.quota_mgr.remaining(model_id) is None
+    assert manager.quota_mgr.total_remaining() is None
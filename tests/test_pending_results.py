@@ -0,0 +1,32 @@
+"""
+@Input:  Background Results of a finished auto-generation job
+@Output: Checks that unreviewed results are kept per library until removed
+@Pos:    tests / test_pending_results.py. Pending Results Store Test.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _stubs
+
+_stubs.ensure_installed()
+
+from calibre_plugins.smart_summary_pro.infrastructure.pending_results import PendingResults
+
+
+def test_results_survive_until_removed():
+    first = PendingResults('lib')
+    first.add({7: {'title': 'A', 'content': '<p>a</p>'}, 9: {'title': 'B', 'content': '<p>b</p>'}})
+    # A later session (new store object) still sees them, keyed by book id.
+    pending = PendingResults('lib')
+    pending.store.update(first.store)
+    assert pending.count() == 2
+    assert pending.entries()[7]['title'] == 'A'
+    assert PendingResults('other').count() == 0
+    pending.remove([7])
+    assert list(pending.entries()) == [9]
+    pending.remove([9])
+    assert 'lib' not in pending.store
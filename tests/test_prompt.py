@@ -0,0 +1,41 @@
+"""
+@Input:  User Prompt Templates
+@Output: Checks that templates failing on every book are rejected at compile time
+@Pos:    tests / test_prompt.py. Prompt Compilation Test.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _stubs
+
+_stubs.ensure_installed()
+
+from calibre_plugins.smart_summary_pro.modules.prompt import CompiledPrompt, PromptTemplateError
+
+
+@pytest.mark.parametrize('template', [
+    "Year: {pubdate:%Y}",
+    "{title!x}",
+    "{title!r}",
+    "{title.nope}",
+    "{authors[0]}",
+    "{nope}",
+    "{}",
+    "{title",
+])
+def test_broken_template_is_rejected(template):
+    with pytest.raises(PromptTemplateError):
+        CompiledPrompt("System", template)
+
+
+def test_valid_template_renders():
+    prompt = CompiledPrompt("System", "Summarize {title} by {authors:>3}. {{literal}}")
+    system, user = prompt.bind({'title': 'Dune', 'authors': ['Frank Herbert']}).render()
+    assert user == "Summarize Dune by Frank Herbert. {literal}"
+    assert prompt.fields == {'title', 'authors'}
@@ -0,0 +1,40 @@
+"""
+@Input:  Sample Model Replies
+@Output: Checks that only wrapper text is stripped from summaries
+@Pos:    tests / test_render.py. Rendering Stage Test.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _stubs
+
+_stubs.ensure_installed()
+
+from calibre_plugins.smart_summary_pro.modules.render import strip_preamble
+
+
+@pytest.mark.parametrize('text', [
+    "Certainly, few novels of the 1920s matched its ambition.\nIt follows three generations.\n\nSecond paragraph.",
+    "Of course, the story begins in Paris.\n\nMore text.",
+    "This is a book.\n\nIf you want to understand modern China, this book is essential reading.",
+    "这是一本书。\n\n如果你想了解现代中国，这本书必读。",
+])
+def test_summary_text_is_kept(text):
+    assert strip_preamble(text) == text
+
+
+@pytest.mark.parametrize('text', [
+    "Sure!\n\nThe summary.",
+    "Sure, here is an introduction to the book:\n\nThe summary.",
+    "以下是这本书的介绍：\nThe summary.",
+    "```markdown\nHere's the introduction:\n\nThe summary.\n```",
+    "The summary.\n\nI hope this helps! Let me know if you need changes.",
+])
+def test_wrapper_text_is_stripped(text):
+    assert strip_preamble(text) == "The summary."
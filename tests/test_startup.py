@@ -0,0 +1,55 @@
+"""
+@Input:  Plugin Sources, Stubbed calibre / qt
+@Output: Startup Budget Check (modules loaded and time spent at Calibre start)
+@Pos:    tests / test_startup.py. Startup Regression Test.
+
+!!! Maintenance Protocol: If logic, dependencies, or output change, 
+!!! update this header AND the parent directory's _DIR_META.md.
+"""
+import json
+import os
+import subprocess
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter, so nothing another test imported is counted.
+STARTUP_SCRIPT = r'''
+import json, sys, time
+sys.path.insert(0, %r)
+import _stubs
+started = time.perf_counter()
+_stubs.install()
+from calibre_plugins.smart_summary_pro.interfaces.ui import SmartSummaryProAction
+action = SmartSummaryProAction()
+action.initialization_complete()
+elapsed = time.perf_counter() - started
+loaded = sorted(m for m in sys.modules if m.startswith(_stubs.PACKAGE + '.'))
+print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))
+'''
+
+# Everything Calibre runs at startup: the plugin entry point, the action
+# module, genesis() and initialization_complete().
+ALLOWED_AT_STARTUP = {
+    'calibre_plugins.smart_summary_pro.interfaces',
+    'calibre_plugins.smart_summary_pro.interfaces.ui',
+}
+STARTUP_BUDGET_SECONDS = 0.25
+
+
+def run_startup():
+    out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT % TESTS_DIR],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_startup_loads_only_the_action():
+    result = run_startup()
+    assert set(result['loaded']) <= ALLOWED_AT_STARTUP, \
+        f"Imported at startup: {sorted(set(result['loaded']) - ALLOWED_AT_STARTUP)}"
+
+
+def test_startup_time_budget():
+    result = run_startup()
+    assert result['elapsed'] < STARTUP_BUDGET_SECONDS, \
+        f"Startup took {result['elapsed'] * 1000:.1f} ms"